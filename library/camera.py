@@ -9,7 +9,10 @@ Defines the interface of the Camera module of the racecar_core library.
 import abc
 import copy
 import numpy as np
+import cv2 as cv
+from enum import IntEnum
 from nptyping import NDArray
+from typing import Any, Optional, Tuple
 
 
 class Camera(abc.ABC):
@@ -24,15 +27,49 @@ class Camera(abc.ABC):
     # Maximum range of the depth camera (in cm)
     _MAX_RANGE = 1200
 
-    def get_color_image(self) -> NDArray[(480, 640, 3), np.uint8]:
+    class PixelFormat(IntEnum):
+        """
+        The pixel formats in which get_color_image() can return the color image.
+        """
+
+        # Blue, green, and red channels, as used by most OpenCV functions
+        bgr = 1
+
+        # A single brightness channel
+        gray = 2
+
+        # Hue, saturation, and value channels, as used for color thresholds
+        hsv = 3
+
+    # The OpenCV conversion from BGR to each other pixel format
+    _CONVERSIONS = {
+        PixelFormat.gray: cv.COLOR_BGR2GRAY,
+        PixelFormat.hsv: cv.COLOR_BGR2HSV,
+    }
+
+    def get_color_image(
+        self,
+        roi: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None,
+        scale: int = 1,
+        pixel_format: PixelFormat = PixelFormat.bgr,
+    ) -> NDArray[(Any, ...), np.uint8]:
         """
         Returns a deep copy of the current color image captured by the camera.
 
+        Args:
+            roi: The region of interest to return, formatted as the (row, column) of
+                its top left pixel (inclusive) and bottom right pixel (exclusive), or
+                None for the full image.
+            scale: Only every scale-th row and column of the region is returned.
+            pixel_format: The format of each pixel in the returned image.
+
         Returns:
             An array representing the pixels in the image, organized as follows
                 0th dimension: pixel rows, indexed from top to bottom.
                 1st dimension: pixel columns, indexed from left to right.
                 2nd dimension: pixel color channels, in the blue-green-red format.
+            If pixel_format is PixelFormat.gray, the 2nd dimension is omitted, and if
+            it is PixelFormat.hsv, the channels are hue, saturation, and value.
 
         Note:
             Each color value ranges from 0 to 255.
@@ -41,6 +78,15 @@ class Camera(abc.ABC):
             we can modify the returned image and it will not change the image returned
             by future calls to get_color_image().
 
+            roi follows the same format as rc_utils.crop.  Pixel (row, col) of the
+            returned image corresponds to pixel (top + row * scale, left + col * scale)
+            of the full image, which rc_utils.get_full_frame_pixel computes.  In
+            RacecarSim, only the requested pixels are transferred.
+
+            HSV images follow the OpenCV convention, in which hue ranges from 0 to 179.
+            In RacecarSim, gray and HSV images are converted by the simulation, so
+            requesting them directly is faster than converting a BGR image.
+
         Example::
 
             # Initialize image with a deep copy of the most recent color image captured
@@ -49,8 +95,26 @@ class Camera(abc.ABC):
 
             # Store the amount of blue in the pixel on row 3, column 5
             blue = image[3][5][0]
+
+            # Get every other pixel of the bottom third of the image
+            floor = rc.camera.get_color_image(((320, 0), (480, 640)), scale=2)
+
+            # Get the image in the HSV format used for color thresholds
+            hsv_image = rc.camera.get_color_image(pixel_format=rc.camera.PixelFormat.hsv)
         """
-        return copy.deepcopy(self.get_color_image_no_copy())
+        assert scale >= 1, f"scale ({scale}) must be a positive integer."
+
+        image = self.get_color_image_no_copy()
+        if roi is not None:
+            ((top, left), (bottom, right)) = roi
+            image = image[top:bottom, left:right]
+        if scale > 1:
+            image = image[::scale, ::scale]
+
+        # Converting the image also creates a copy
+        if pixel_format in self._CONVERSIONS:
+            return cv.cvtColor(image, self._CONVERSIONS[pixel_format])
+        return copy.deepcopy(image)
 
     @abc.abstractmethod
     def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
@@ -163,6 +227,37 @@ class Camera(abc.ABC):
         """
         pass
 
+    def get_depth_image_native(self) -> Tuple[NDArray[(Any, Any), np.float32], int]:
+        """
+        Returns the current depth image at the resolution at which it was captured.
+
+        Returns:
+            The depth image, formatted like get_depth_image(), and the scale factor
+            between it and the full resolution of get_width() by get_height().  Pixel
+            (row, col) of the depth image covers the square of full resolution pixels
+            starting at (row * scale, col * scale).
+
+        Warning:
+            Do not modify the returned image, which is shared with future calls to
+            get_depth_image_native() in the same frame.
+
+        Note:
+            In RacecarSim, the depth camera captures a much smaller image, which
+            get_depth_image() upsamples to full resolution.  Working with the native
+            image directly avoids creating the full resolution copy.  The depth
+            functions in rc_utils accept the native image along with its scale.
+
+        Example::
+
+            (depth_image, scale) = rc.camera.get_depth_image_native()
+
+            # Find the distance of the object at full resolution pixel row 3, column 5
+            distance = rc_utils.get_pixel_average_distance(
+                depth_image, (3, 5), scale=scale
+            )
+        """
+        return (self.get_depth_image(), 1)
+
     def get_width(self) -> int:
         """
         Returns the pixel width of the color and depth images.
@@ -0,0 +1,327 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains tools for measuring where the time of each frame is spent.
+"""
+
+import collections
+import math
+import time
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from nptyping import NDArray
+
+
+class Histogram:
+    """
+    Counts values in a fixed number of buckets whose bounds grow geometrically, so
+    that each value is recorded in constant time and memory, and percentiles can be
+    estimated to within the width of a bucket.
+    """
+
+    def __init__(
+        self, lowest: float, highest: float, buckets_per_doubling: int = 4
+    ) -> None:
+        """
+        Creates an empty histogram.
+
+        Args:
+            lowest: The upper bound of the first bucket, which holds every smaller
+                value.
+            highest: The lower bound of the last bucket, which holds every larger
+                value.
+            buckets_per_doubling: The number of buckets between a value and double
+                that value, which sets the precision of the estimated percentiles.
+
+        Example::
+
+            # Count durations between 10 microseconds and 10 seconds, with each bucket
+            # about 19% wider than the previous one
+            histogram = Histogram(1e-5, 10)
+        """
+        assert (
+            0 < lowest < highest
+        ), f"lowest ({lowest}) must be positive and less than highest ({highest})."
+        assert (
+            buckets_per_doubling > 0
+        ), f"buckets_per_doubling ({buckets_per_doubling}) must be positive."
+
+        self.__lowest: float = lowest
+        self.__buckets_per_doubling: int = buckets_per_doubling
+
+        # The first and last buckets hold the values out of range
+        num_buckets = math.ceil(math.log2(highest / lowest) * buckets_per_doubling) + 2
+        self.__counts: List[int] = [0] * num_buckets
+        self.__count: int = 0
+        self.__total: float = 0
+        self.__max: float = 0
+
+    def add(self, value: float) -> None:
+        """
+        Records a value.
+
+        Args:
+            value: The value to record, which should not be negative.
+        """
+        if value < self.__lowest:
+            index = 0
+        else:
+            index = int(math.log2(value / self.__lowest) * self.__buckets_per_doubling)
+            index = min(index + 1, len(self.__counts) - 1)
+        self.__counts[index] += 1
+        self.__count += 1
+        self.__total += value
+        self.__max = max(self.__max, value)
+
+    def clear(self) -> None:
+        """
+        Discards every recorded value.
+        """
+        self.__counts = [0] * len(self.__counts)
+        self.__count = 0
+        self.__total = 0
+        self.__max = 0
+
+    def get_count(self) -> int:
+        """
+        Returns the number of values recorded.
+        """
+        return self.__count
+
+    def get_total(self) -> float:
+        """
+        Returns the sum of the values recorded.
+        """
+        return self.__total
+
+    def get_mean(self) -> float:
+        """
+        Returns the mean of the values recorded, or 0 if none were recorded.
+        """
+        return self.__total / self.__count if self.__count > 0 else 0
+
+    def get_max(self) -> float:
+        """
+        Returns the largest value recorded, or 0 if none were recorded.
+        """
+        return self.__max
+
+    def get_percentile(self, percentile: float) -> float:
+        """
+        Estimates the value below which a percentage of the recorded values fall.
+
+        Args:
+            percentile: The percentage of values, from 0 to 100.
+
+        Returns:
+            The upper bound of the bucket holding the percentile (but no more than the
+            largest value recorded), or 0 if no values were recorded.
+
+        Example::
+
+            # The 95th percentile duration, in milliseconds
+            p95 = histogram.get_percentile(95) * 1000
+        """
+        assert (
+            0 <= percentile <= 100
+        ), f"percentile ({percentile}) must be between 0 and 100."
+
+        if self.__count == 0:
+            return 0
+
+        # Find the first bucket at which the cumulative count reaches the percentile
+        target = percentile / 100 * self.__count
+        cumulative = 0
+        for (index, count) in enumerate(self.__counts):
+            cumulative += count
+            if cumulative >= target and cumulative > 0:
+                upper_bound = self.__lowest * 2 ** (index / self.__buckets_per_doubling)
+                return min(upper_bound, self.__max)
+        return self.__max
+
+
+class FrameProfiler:
+    """
+    Times the phases of each frame, such as the update function and the sleep until
+    the next frame, and keeps percentiles of the recent frames along with a log of the
+    frames which took longer than the frame budget.
+
+    Each phase costs only a clock read and an array write, so the profiler can be left
+    on while the car is driven.
+    """
+
+    # The number of recent frames from which percentiles are computed
+    __WINDOW = 600
+
+    # The number of recent slow frames which are kept in the log
+    __MAX_SLOW_FRAMES = 32
+
+    # Time spent in this phase does not count against the frame budget
+    __SLEEP = "sleep"
+
+    def __init__(self, frame_budget: float = 1 / 60) -> None:
+        """
+        Creates a profiler with no frames recorded.
+
+        Args:
+            frame_budget: The number of seconds each frame may take, not counting the
+                sleep until the next frame.
+        """
+        self.__frame_budget: float = frame_budget
+
+        # The durations of each phase over the recent frames, in a ring buffer indexed
+        # by the number of frames it has recorded
+        self.__durations: Dict[str, NDArray[Any, np.float64]] = {}
+        self.__num_recorded: Dict[str, int] = {}
+        self.__num_overruns: Dict[str, int] = {"frame": 0}
+        self.__num_frames: int = 0
+        self.__slow_frames: Deque[Tuple[int, str, Dict[str, float]]] = (
+            collections.deque(maxlen=self.__MAX_SLOW_FRAMES)
+        )
+
+        # The phases of the current frame
+        self.__phase: Optional[str] = None
+        self.__phase_start: float = 0
+        self.__frame: Dict[str, float] = {}
+
+    def start_phase(self, phase: str) -> None:
+        """
+        Ends the current phase of the frame, if any, and starts timing another.
+
+        Args:
+            phase: The name of the phase, such as "update".
+        """
+        now = time.perf_counter()
+        self.__end_phase(now)
+        self.__phase = phase
+        self.__phase_start = now
+
+    def end_frame(self) -> None:
+        """
+        Ends the current phase and records the frame, if any phase was started.
+        """
+        self.__end_phase(time.perf_counter())
+        if len(self.__frame) == 0:
+            return
+
+        frame = self.__frame
+        self.__frame = {}
+        busy_time = sum(
+            duration for (phase, duration) in frame.items() if phase != self.__SLEEP
+        )
+        self.__record("frame", busy_time)
+        for (phase, duration) in frame.items():
+            self.__record(phase, duration)
+
+        # Log which phase took the longest in a frame over budget
+        if busy_time > self.__frame_budget:
+            slowest = max(
+                (phase for phase in frame if phase != self.__SLEEP),
+                key=lambda phase: frame[phase],
+            )
+            self.__num_overruns["frame"] += 1
+            self.__num_overruns[slowest] = self.__num_overruns.get(slowest, 0) + 1
+            self.__slow_frames.append(
+                (
+                    self.__num_frames,
+                    slowest,
+                    {phase: duration * 1000 for (phase, duration) in frame.items()},
+                )
+            )
+        self.__num_frames += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns statistics about the duration of each phase over the recent frames.
+
+        Returns:
+            A dictionary from each phase name, along with "frame" for the time of the
+            entire frame except for sleep, to the number of times the phase was timed
+            ("count"), its 50th, 95th, and 99th percentile and maximum duration in
+            milliseconds over the last 600 times ("p50_ms", "p95_ms", "p99_ms", and
+            "max_ms"), and the number of frames over budget in which the phase took
+            the longest ("overruns", which for "frame" counts every frame over
+            budget).
+
+        Example::
+
+            # Warn if the update function is often too slow
+            stats = rc.profiler.get_stats()
+            if stats["update"]["p95_ms"] > 1000 / 60:
+                rc_utils.print_warning("update is slower than the frame rate")
+        """
+        stats: Dict[str, Dict[str, float]] = {}
+        for (phase, durations) in self.__durations.items():
+            count = self.__num_recorded[phase]
+            recent = durations[: min(count, self.__WINDOW)] * 1000
+            (p50, p95, p99) = np.percentile(recent, (50, 95, 99))
+            stats[phase] = {
+                "count": count,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "max_ms": np.max(recent),
+                "overruns": self.__num_overruns.get(phase, 0),
+            }
+        return stats
+
+    def get_slow_frames(self) -> List[Tuple[int, str, Dict[str, float]]]:
+        """
+        Returns the most recent frames which took longer than the frame budget.
+
+        Returns:
+            Up to 32 tuples, oldest first, each containing the index of the frame, the
+            name of the phase which took the longest, and the duration of each phase of
+            the frame in milliseconds.
+
+        Example::
+
+            for (frame, phase, durations) in rc.profiler.get_slow_frames():
+                print(f"Frame {frame} spent {durations[phase]:.1f} ms in {phase}")
+        """
+        return list(self.__slow_frames)
+
+    def print_stats(self) -> None:
+        """
+        Prints a table of the statistics returned by get_stats, followed by the slow
+        frame log.
+
+        Example::
+
+            # Print the frame statistics once per second
+            def update_slow():
+                rc.profiler.print_stats()
+        """
+        print(
+            f">> {'Phase':<16}{'count':>8}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'max ms':>9}{'overruns':>10}"
+        )
+        for (phase, values) in self.get_stats().items():
+            print(
+                f"   {phase:<16}{values['count']:>8}{values['p50_ms']:>9.2f}"
+                f"{values['p95_ms']:>9.2f}{values['p99_ms']:>9.2f}"
+                f"{values['max_ms']:>9.2f}{values['overruns']:>10}"
+            )
+        for (frame, phase, durations) in self.__slow_frames:
+            phases = ", ".join(
+                f"{name} {duration:.1f} ms" for (name, duration) in durations.items()
+            )
+            print(f"   Slow frame {frame} ({phase}): {phases}")
+
+    def __end_phase(self, now: float) -> None:
+        if self.__phase is not None:
+            self.__frame[self.__phase] = (
+                self.__frame.get(self.__phase, 0) + now - self.__phase_start
+            )
+            self.__phase = None
+
+    def __record(self, phase: str, duration: float) -> None:
+        if phase not in self.__durations:
+            self.__durations[phase] = np.zeros(self.__WINDOW)
+            self.__num_recorded[phase] = 0
+        count = self.__num_recorded[phase]
+        self.__durations[phase][count % self.__WINDOW] = duration
+        self.__num_recorded[phase] = count + 1
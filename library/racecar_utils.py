@@ -7,7 +7,9 @@ Contains helper functions to support common operations.
 """
 
 import cv2 as cv
+import math
 import numpy as np
+import weakref
 from typing import *
 from nptyping import NDArray
 from enum import Enum, IntEnum
@@ -240,6 +242,43 @@ def crop(
     return image[r_min:r_max, c_min:c_max]
 
 
+def get_full_frame_pixel(
+    pixel: Tuple[int, int],
+    top_left_inclusive: Tuple[int, int] = (0, 0),
+    scale: int = 1,
+) -> Tuple[int, int]:
+    """
+    Converts a pixel of a cropped and/or downscaled image to the full image.
+
+    Args:
+        pixel: The (row, column) of the pixel in the cropped or downscaled image.
+        top_left_inclusive: The (row, column) of the top left pixel of the crop
+            rectangle in the full image.
+        scale: The factor by which the cropped image was downscaled.
+
+    Returns:
+        The (row, column) of the corresponding pixel in the full image.
+
+    Example::
+
+        # Request every other pixel of the bottom third of the image
+        image = rc.camera.get_color_image(((320, 0), (480, 640)), scale=2)
+
+        # Find the center of the largest blue contour in full image coordinates
+        contour = rc_utils.get_largest_contour(
+            rc_utils.find_contours(image, BLUE_HSV_MIN, BLUE_HSV_MAX)
+        )
+        if contour is not None:
+            center = rc_utils.get_full_frame_pixel(
+                rc_utils.get_contour_center(contour), (320, 0), 2
+            )
+    """
+    return (
+        top_left_inclusive[0] + pixel[0] * scale,
+        top_left_inclusive[1] + pixel[1] * scale,
+    )
+
+
 def stack_images_horizontal(
     image_0: NDArray[(Any, ...), Any], image_1: NDArray[(Any, ...), Any]
 ) -> NDArray[(Any, ...), Any]:
@@ -306,6 +345,103 @@ def stack_images_vertical(
     return np.vstack((image_0, image_1))
 
 
+class _FrameCache:
+    """
+    Holds intermediate results computed from the images of the current frame, keyed
+    by the identity of each image.
+    """
+
+    def __init__(self) -> None:
+        # Maps the id of each image to a weak reference to that image, which detects
+        # when the id has been reused by another array, and the results computed from it
+        self.__images: Dict[int, Tuple[weakref.ref, Dict[Hashable, Any]]] = {}
+
+    def get(self, image: NDArray, key: Hashable, compute: Callable[[], Any]) -> Any:
+        entry = self.__images.get(id(image))
+        if entry is None or entry[0]() is not image:
+            entry = (weakref.ref(image), {})
+            self.__images[id(image)] = entry
+
+        results = entry[1]
+        if key not in results:
+            results[key] = compute()
+        return results[key]
+
+    def clear(self) -> None:
+        self.__images.clear()
+
+
+# The cache of the current frame, or None if caching is disabled
+_frame_cache: Optional[_FrameCache] = None
+
+
+def enable_frame_cache(enabled: bool = True) -> None:
+    """
+    Enables or disables reusing intermediate results, such as the hsv version of a
+    color image and its color masks, when the same image is processed more than once
+    in a frame.
+
+    Args:
+        enabled: Whether intermediate results are reused.
+
+    Note:
+        Cached results are discarded at the start of every frame, and results are
+        only reused for the same image object, so each call to
+        rc.camera.get_color_image() starts over.
+
+        An image should not be modified (for example, by drawing on it) after it has
+        been processed if it will be processed again in the same frame, since the
+        results computed before the modification would be reused.
+
+    Example::
+
+        # Convert the image to hsv only once even though it is searched twice
+        rc_utils.enable_frame_cache()
+        image = rc.camera.get_color_image()
+        blue_contours = rc_utils.find_contours(image, BLUE[0], BLUE[1])
+        red_contours = rc_utils.find_contours(image, RED[0], RED[1])
+    """
+    global _frame_cache
+    if enabled and _frame_cache is None:
+        _frame_cache = _FrameCache()
+    elif not enabled:
+        _frame_cache = None
+
+
+def clear_frame_cache() -> None:
+    """
+    Discards the intermediate results reused within a frame.
+
+    Note:
+        This is called automatically at the end of every frame, so it only needs to
+        be called after modifying an image which will be processed again.
+    """
+    if _frame_cache is not None:
+        _frame_cache.clear()
+
+
+def _memoize(image: NDArray, key: Hashable, compute: Callable[[], Any]) -> Any:
+    """
+    Returns the result of compute, reusing it for the same image and key within a
+    frame if the frame cache is enabled.
+    """
+    if _frame_cache is None:
+        return compute()
+    return _frame_cache.get(image, key, compute)
+
+
+def _convert_to_hsv(
+    color_image: NDArray[(Any, Any, 3), np.uint8],
+) -> NDArray[(Any, Any, 3), np.uint8]:
+    """
+    Converts a bgr image to hsv, reusing the conversion within a frame if the frame
+    cache is enabled.
+    """
+    return _memoize(
+        color_image, "hsv", lambda: cv.cvtColor(color_image, cv.COLOR_BGR2HSV)
+    )
+
+
 ########################################################################################
 # Color Images
 ########################################################################################
@@ -338,6 +474,8 @@ def find_contours(
     color_image: NDArray[(Any, Any, 3), np.uint8],
     hsv_lower: Tuple[int, int, int],
     hsv_upper: Tuple[int, int, int],
+    downscale: int = 1,
+    roi: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None,
 ) -> List[NDArray]:
     """
     Finds all contours of the specified color range in the provided image.
@@ -349,6 +487,11 @@ def find_contours(
             to contour.
         hsv_upper: The upper bound for the hue, saturation, and value of the colors
             to contour.
+        downscale: The factor by which to shrink the width and height of the image
+            before searching it, such as 2 or 4.
+        roi: The (top_left_inclusive, bottom_right_exclusive) corners of the region
+            of the image to search, as passed to crop, or None to search the entire
+            image.
 
     Returns:
         A list of contours around the specified color ranges found in color_image.
@@ -356,6 +499,16 @@ def find_contours(
     Note:
         Each channel in hsv_lower and hsv_upper ranges from 0 to 255.
 
+        Searching an image downscaled by a factor of n takes about 1/n^2 as long.
+        The contours are returned in the coordinates of the full image, so they can
+        be used with get_contour_center and get_contour_area as usual, but they are
+        only accurate to within n pixels and contours smaller than n pixels wide
+        may be missed.
+
+        Searching a region of interest does not copy the image, and the contours are
+        also returned in the coordinates of the full image, so they can be drawn
+        directly on color_image.
+
     Example::
 
         # Define the lower and upper hsv ranges for the color blue
@@ -366,6 +519,199 @@ def find_contours(
         contours = rc_utils.find_contours(
             rc.camera.get_color_image(), BLUE_HSV_MIN, BLUE_HSV_MAX
         )
+
+        # Do the same on an image a quarter of the width and height, which is faster
+        contours = rc_utils.find_contours(
+            rc.camera.get_color_image(), BLUE_HSV_MIN, BLUE_HSV_MAX, downscale=4
+        )
+
+        # Only search the floor in front of the car, and draw the largest contour
+        # on the full image
+        image = rc.camera.get_color_image()
+        CROP_FLOOR = ((360, 0), (rc.camera.get_height(), rc.camera.get_width()))
+        contours = rc_utils.find_contours(
+            image, BLUE_HSV_MIN, BLUE_HSV_MAX, roi=CROP_FLOOR
+        )
+        largest_contour = rc_utils.get_largest_contour(contours)
+        if largest_contour is not None:
+            rc_utils.draw_contour(image, largest_contour)
+    """
+    # Find and return a list of all contours of the mask of this color range
+    (color_image, origin) = _crop_to_roi(color_image, roi)
+    color_image = _downscale(color_image, downscale)
+    mask = _get_color_mask(color_image, hsv_lower, hsv_upper)
+    return _find_mask_contours(mask, downscale, origin)
+
+
+def find_contours_by_color(
+    color_image: NDArray[(Any, Any, 3), np.uint8],
+    color_ranges: List[Tuple[Tuple[int, int, int], Tuple[int, int, int], str]],
+    downscale: int = 1,
+    roi: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None,
+) -> Dict[str, List[NDArray]]:
+    """
+    Finds all contours of each of several color ranges in the provided image.
+
+    Args:
+        color_image: The color image in which to find contours,
+            with pixels represented in the bgr (blue-green-red) format.
+        color_ranges: A list of (hsv_lower, hsv_upper, name) tuples, each containing
+            the lower and upper bound for the hue, saturation, and value of a color
+            and the name of that color.
+        downscale: The factor by which to shrink the width and height of the image
+            before searching it, as in find_contours.
+        roi: The region of the image to search, as in find_contours.
+
+    Returns:
+        A dictionary from the name of each color to the list of contours around
+        that color range found in color_image.
+
+    Note:
+        This is equivalent to calling find_contours once per color range, but converts
+        color_image to hsv only once, so it is faster when searching for several
+        colors in the same image.
+
+    Example::
+
+        # Define the lower and upper hsv ranges of the colors to search for
+        COLORS = [
+            ((90, 50, 50), (120, 255, 255), "blue"),
+            ((40, 50, 50), (80, 255, 255), "green"),
+            ((170, 50, 50), (10, 255, 255), "red"),
+        ]
+
+        # Extract contours around each color in the current image
+        contours = rc_utils.find_contours_by_color(rc.camera.get_color_image(), COLORS)
+        largest_red_contour = rc_utils.get_largest_contour(contours["red"])
+    """
+    # Convert the image once, then create a mask for each color range
+    (color_image, origin) = _crop_to_roi(color_image, roi)
+    color_image = _downscale(color_image, downscale)
+    hsv_image = _convert_to_hsv(color_image)
+
+    contours: Dict[str, List[NDArray]] = {}
+    for (hsv_lower, hsv_upper, name) in color_ranges:
+        mask = _get_color_mask(color_image, hsv_lower, hsv_upper, hsv_image)
+        contours[name] = _find_mask_contours(mask, downscale, origin)
+    return contours
+
+
+def _crop_to_roi(
+    image: NDArray[(Any, ...), Any],
+    roi: Optional[Tuple[Tuple[int, int], Tuple[int, int]]],
+) -> Tuple[NDArray[(Any, ...), Any], Tuple[int, int]]:
+    """
+    Returns the view of an image within a region of interest along with the (row,
+    column) of the top left pixel of the region, reusing the view within a frame if
+    the frame cache is enabled.
+    """
+    if roi is None:
+        return (image, (0, 0))
+
+    (top_left, bottom_right) = roi
+    view = _memoize(
+        image,
+        ("roi", tuple(top_left), tuple(bottom_right)),
+        lambda: crop(image, top_left, bottom_right),
+    )
+    return (view, (int(top_left[0]), int(top_left[1])))
+
+
+def _downscale(
+    color_image: NDArray[(Any, Any, 3), np.uint8], downscale: int
+) -> NDArray[(Any, Any, 3), np.uint8]:
+    """
+    Shrinks an image by an integer factor, reusing the result within a frame if the
+    frame cache is enabled.
+    """
+    assert (
+        isinstance(downscale, int) and downscale >= 1
+    ), f"downscale ({downscale}) must be a positive integer."
+
+    if downscale == 1:
+        return color_image
+
+    # Keep one pixel out of each block, so colors are not blended at their edges
+    return _memoize(
+        color_image,
+        ("downscale", downscale),
+        lambda: cv.resize(
+            color_image,
+            None,
+            fx=1 / downscale,
+            fy=1 / downscale,
+            interpolation=cv.INTER_NEAREST,
+        ),
+    )
+
+
+def _find_mask_contours(
+    mask: NDArray[(Any, Any), np.uint8],
+    downscale: int = 1,
+    origin: Tuple[int, int] = (0, 0),
+) -> List[NDArray]:
+    """
+    Finds the contours of a mask of the region of the full image starting at origin,
+    downscaled by a factor of downscale, in the coordinates of the full image.
+    """
+    (row, column) = origin
+    if downscale == 1:
+        return cv.findContours(
+            mask, cv.RETR_LIST, cv.CHAIN_APPROX_SIMPLE, offset=(column, row)
+        )[0]
+
+    # Each pixel of the mask covers a downscale x downscale block of the full image
+    contours = cv.findContours(mask, cv.RETR_LIST, cv.CHAIN_APPROX_SIMPLE)[0]
+    offset = np.array((column, row)) + (downscale - 1) // 2
+    return [(contour * downscale + offset).astype(np.int32) for contour in contours]
+
+
+def _get_color_mask(
+    color_image: NDArray[(Any, Any, 3), np.uint8],
+    hsv_lower: Tuple[int, int, int],
+    hsv_upper: Tuple[int, int, int],
+    hsv_image: Optional[NDArray[(Any, Any, 3), np.uint8]] = None,
+) -> NDArray[(Any, Any), np.uint8]:
+    """
+    Creates a mask of the pixels of a bgr image within the specified hsv range,
+    reusing the mask within a frame if the frame cache is enabled.
+    """
+
+    def compute_mask():
+        image = hsv_image if hsv_image is not None else _convert_to_hsv(color_image)
+        return _get_hsv_mask(image, hsv_lower, hsv_upper)
+
+    key = ("mask", tuple(hsv_lower), tuple(hsv_upper))
+    return _memoize(color_image, key, compute_mask)
+
+
+def _get_hsv_mask(
+    hsv_image: NDArray[(Any, Any, 3), np.uint8],
+    hsv_lower: Tuple[int, int, int],
+    hsv_upper: Tuple[int, int, int],
+) -> NDArray[(Any, Any), np.uint8]:
+    """
+    Creates a mask of the pixels of an hsv image within the specified color range.
+    """
+    _check_hsv_range(hsv_lower, hsv_upper)
+
+    # Create a mask containing the pixels in the image with hsv values between
+    # hsv_lower and hsv_upper.
+    if hsv_lower[0] <= hsv_upper[0]:
+        return cv.inRange(hsv_image, hsv_lower, hsv_upper)
+
+    # If the color range passes the 255-0 boundary, we must create two masks
+    # and merge them
+    mask1 = cv.inRange(hsv_image, hsv_lower, (255, hsv_upper[1], hsv_upper[2]))
+    mask2 = cv.inRange(hsv_image, (0, hsv_lower[1], hsv_lower[2]), hsv_upper)
+    return cv.bitwise_or(mask1, mask2)
+
+
+def _check_hsv_range(
+    hsv_lower: Tuple[int, int, int], hsv_upper: Tuple[int, int, int]
+) -> None:
+    """
+    Asserts that the channels of an hsv color range are in bounds.
     """
     assert (
         0 <= hsv_lower[0] <= 179 and 0 <= hsv_upper[0] <= 179
@@ -376,7 +722,7 @@ def find_contours(
     ), f"The saturation of hsv_lower ({hsv_lower}) and hsv_upper ({hsv_upper}) must be in the range 0 to 255 inclusive."
 
     assert (
-        0 <= hsv_lower[0] <= 255 and 0 <= hsv_upper[0] <= 255
+        0 <= hsv_lower[2] <= 255 and 0 <= hsv_upper[2] <= 255
     ), f"The value of hsv_lower ({hsv_lower}) and hsv_upper ({hsv_upper}) must be in the range 0 to 255 inclusive."
 
     assert (
@@ -387,25 +733,174 @@ def find_contours(
         hsv_lower[2] <= hsv_upper[2]
     ), f"The value channel of hsv_lower ({hsv_lower}) must be less than that of of hsv_upper ({hsv_upper})."
 
-    # Convert the image from a blue-green-red pixel representation to a
-    # hue-saturation-value representation
-    hsv_image = cv.cvtColor(color_image, cv.COLOR_BGR2HSV)
 
-    # Create a mask containing the pixels in the image with hsv values between
-    # hsv_lower and hsv_upper.
-    mask: NDArray
-    if hsv_lower[0] <= hsv_upper[0]:
-        mask = cv.inRange(hsv_image, hsv_lower, hsv_upper)
+class ColorClassifier:
+    """
+    Sorts the pixels of color images into a fixed set of hsv color ranges, using
+    lookup tables built once from the ranges.
 
-    # If the color range passes the 255-0 boundary, we must create two masks
-    # and merge them
-    else:
-        mask1 = cv.inRange(hsv_image, hsv_lower, (255, hsv_upper[1], hsv_upper[2]))
-        mask2 = cv.inRange(hsv_image, (0, hsv_lower[1], hsv_lower[2]), hsv_upper)
-        mask = cv.bitwise_or(mask1, mask2)
+    Each pixel is classified against every color at once with one table lookup per
+    hsv channel, so finding several colors costs about as much as finding one, and
+    ranges which wrap around in hue cost no more than any other range.
+    """
+
+    # The colors of each pixel are stored as the bits of a uint8
+    __MAX_COLORS = 8
+
+    def __init__(
+        self,
+        color_ranges: List[Tuple[Tuple[int, int, int], Tuple[int, int, int], str]],
+    ) -> None:
+        """
+        Creates a classifier for the provided color ranges.
+
+        Args:
+            color_ranges: A list of up to 8 (hsv_lower, hsv_upper, name) tuples, each
+                containing the lower and upper bound for the hue, saturation, and
+                value of a color and the name of that color.
 
-    # Find and return a list of all contours of this mask
-    return cv.findContours(mask, cv.RETR_LIST, cv.CHAIN_APPROX_SIMPLE)[0]
+        Example::
+
+            # Build the classifier once, outside of update
+            classifier = rc_utils.ColorClassifier(
+                [
+                    ((90, 50, 50), (120, 255, 255), "blue"),
+                    ((40, 50, 50), (80, 255, 255), "green"),
+                    ((170, 50, 50), (10, 255, 255), "red"),
+                ]
+            )
+        """
+        assert (
+            0 < len(color_ranges) <= self.__MAX_COLORS
+        ), f"color_ranges must contain between 1 and {self.__MAX_COLORS} colors, but had {len(color_ranges)}."
+
+        self.__names: List[str] = [name for (_, _, name) in color_ranges]
+        assert len(set(self.__names)) == len(
+            self.__names
+        ), f"The names in color_ranges ({self.__names}) must be unique."
+
+        # For each channel, map each channel value to the bits of the colors whose
+        # range includes that value
+        values = np.arange(256)
+        self.__tables: List[NDArray[(256,), np.uint8]] = [
+            np.zeros(256, np.uint8) for _ in range(3)
+        ]
+        for (index, (hsv_lower, hsv_upper, _)) in enumerate(color_ranges):
+            _check_hsv_range(hsv_lower, hsv_upper)
+            for channel in range(3):
+                lower = hsv_lower[channel]
+                upper = hsv_upper[channel]
+                if lower <= upper:
+                    inside = (lower <= values) & (values <= upper)
+                else:
+                    # The hue range passes the 179-0 boundary
+                    inside = (lower <= values) | (values <= upper)
+                self.__tables[channel][inside] |= 1 << index
+
+        # Map the bits of each pixel to the label of the first color it matches
+        self.__label_table: NDArray[(256,), np.uint8] = np.zeros(256, np.uint8)
+        for bits in range(1, 256):
+            self.__label_table[bits] = (bits & -bits).bit_length()
+
+    def get_names(self) -> List[str]:
+        """
+        Returns the names of the colors, in the order they were provided.
+        """
+        return list(self.__names)
+
+    def get_label_image(
+        self, color_image: NDArray[(Any, Any, 3), np.uint8]
+    ) -> NDArray[(Any, Any), np.uint8]:
+        """
+        Finds the color of each pixel in the provided image.
+
+        Args:
+            color_image: The color image to classify, with pixels represented in the
+                bgr (blue-green-red) format.
+
+        Returns:
+            An image of the same size containing 0 for each pixel which matches none of
+            the colors, and otherwise 1 plus the index of the first color it matches.
+
+        Example::
+
+            # Count the pixels of the first color ("blue" above)
+            labels = classifier.get_label_image(rc.camera.get_color_image())
+            num_blue_pixels = np.count_nonzero(labels == 1)
+        """
+        return cv.LUT(self.__classify(color_image), self.__label_table)
+
+    def get_masks(
+        self, color_image: NDArray[(Any, Any, 3), np.uint8]
+    ) -> Dict[str, NDArray[(Any, Any), np.uint8]]:
+        """
+        Finds the pixels of each color in the provided image.
+
+        Args:
+            color_image: The color image to classify, with pixels represented in the
+                bgr (blue-green-red) format.
+
+        Returns:
+            A dictionary from the name of each color to a mask which is 255 for the
+            pixels within that color range and 0 elsewhere.
+
+        Note:
+            Each pixel is included in the mask of every color range it falls within,
+            so the masks are the same as those used by find_contours.
+        """
+        bits = self.__classify(color_image)
+        return {
+            name: cv.compare(cv.bitwise_and(bits, 1 << index), 0, cv.CMP_NE)
+            for (index, name) in enumerate(self.__names)
+        }
+
+    def find_contours(
+        self,
+        color_image: NDArray[(Any, Any, 3), np.uint8],
+        downscale: int = 1,
+        roi: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None,
+    ) -> Dict[str, List[NDArray]]:
+        """
+        Finds all contours of each color in the provided image.
+
+        Args:
+            color_image: The color image in which to find contours, with pixels
+                represented in the bgr (blue-green-red) format.
+            downscale: The factor by which to shrink the width and height of the image
+                before searching it, as in rc_utils.find_contours.
+            roi: The region of the image to search, as in rc_utils.find_contours.
+
+        Returns:
+            A dictionary from the name of each color to the list of contours around
+            that color found in color_image, the same as find_contours_by_color.
+
+        Example::
+
+            contours = classifier.find_contours(rc.camera.get_color_image())
+            largest_red_contour = rc_utils.get_largest_contour(contours["red"])
+        """
+        (color_image, origin) = _crop_to_roi(color_image, roi)
+        masks = self.get_masks(_downscale(color_image, downscale))
+        return {
+            name: _find_mask_contours(mask, downscale, origin)
+            for (name, mask) in masks.items()
+        }
+
+    def __classify(
+        self, color_image: NDArray[(Any, Any, 3), np.uint8]
+    ) -> NDArray[(Any, Any), np.uint8]:
+        """
+        Returns an image containing the bits of the colors each pixel matches.
+        """
+
+        def compute_bits():
+            (hue, saturation, value) = cv.split(_convert_to_hsv(color_image))
+            bits = cv.bitwise_and(
+                cv.LUT(hue, self.__tables[0]), cv.LUT(saturation, self.__tables[1])
+            )
+            return cv.bitwise_and(bits, cv.LUT(value, self.__tables[2]))
+
+        return _memoize(color_image, ("classify", id(self)), compute_bits)
 
 
 def get_largest_contour(
@@ -594,6 +1089,512 @@ def get_contour_area(contour: NDArray) -> float:
     return cv.contourArea(contour)
 
 
+class Blobs:
+    """
+    The connected regions of pixels in a mask, with the area, bounding box, and center
+    of every region stored in NumPy arrays sorted from the largest region to the
+    smallest.
+    """
+
+    def __init__(
+        self,
+        labels: NDArray[(Any, Any), np.int32],
+        label_ids: NDArray[(Any,), np.int32],
+        stats: NDArray[(Any, 5), np.int32],
+        centroids: NDArray[(Any, 2), np.float64],
+        origin: Tuple[int, int] = (0, 0),
+        shape: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        """
+        Creates the blobs found by find_blobs.
+
+        Args:
+            labels: The label image returned by cv.connectedComponentsWithStats.
+            label_ids: The label of each blob, sorted from largest to smallest.
+            stats: The stats of each blob returned by cv.connectedComponentsWithStats.
+            centroids: The (x, y) center of each blob returned by
+                cv.connectedComponentsWithStats.
+            origin: The (row, column) in the full mask of the top left pixel of the
+                labeled region.
+            shape: The shape of the full mask, or None if it is the labeled region.
+        """
+        self.__labels: NDArray[(Any, Any), np.int32] = labels
+        self.__label_ids: NDArray[(Any,), np.int32] = label_ids
+        self.__areas: NDArray[(Any,), np.int32] = stats[:, cv.CC_STAT_AREA]
+        self.__origin: Tuple[int, int] = origin
+        self.__shape: Tuple[int, int] = shape if shape is not None else labels.shape
+
+        # Convert to the (row, column) convention used by the rest of rc_utils, in the
+        # coordinates of the full mask
+        top = stats[:, cv.CC_STAT_TOP] + origin[0]
+        left = stats[:, cv.CC_STAT_LEFT] + origin[1]
+        self.__bounding_boxes: NDArray[(Any, 4), np.int32] = np.stack(
+            (
+                top,
+                left,
+                top + stats[:, cv.CC_STAT_HEIGHT],
+                left + stats[:, cv.CC_STAT_WIDTH],
+            ),
+            axis=1,
+        )
+        self.__centers: NDArray[(Any, 2), np.float64] = centroids[:, ::-1] + origin
+
+    def __len__(self) -> int:
+        return len(self.__label_ids)
+
+    def get_areas(self) -> NDArray[(Any,), np.int32]:
+        """
+        Returns the number of pixels in each blob, from largest to smallest.
+        """
+        return self.__areas
+
+    def get_bounding_boxes(self) -> NDArray[(Any, 4), np.int32]:
+        """
+        Returns the bounding box of each blob.
+
+        Returns:
+            An array containing the (top, left, bottom, right) of each blob, where
+            (top, left) is the first pixel inside the box and (bottom, right) is the
+            pixel one past the bottom right corner, as in crop.
+
+        Example::
+
+            # Crop the image to the largest blob
+            (top, left, bottom, right) = blobs.get_bounding_boxes()[0]
+            cropped_image = rc_utils.crop(image, (top, left), (bottom, right))
+        """
+        return self.__bounding_boxes
+
+    def get_centers(self) -> NDArray[(Any, 2), np.float64]:
+        """
+        Returns the (row, column) of the center of mass of each blob.
+        """
+        return self.__centers
+
+    def get_mask(self, index: int) -> NDArray[(Any, Any), np.uint8]:
+        """
+        Returns a mask of the size of the original mask containing only one blob.
+
+        Args:
+            index: The index of the blob, where 0 is the largest.
+        """
+        assert (
+            0 <= index < len(self)
+        ), f"index ({index}) must be less than the number of blobs ({len(self)})."
+
+        (top, left) = self.__origin
+        (height, width) = self.__labels.shape
+        mask = np.zeros(self.__shape, np.uint8)
+        mask[top : top + height, left : left + width] = (
+            np.uint8(self.__labels == self.__label_ids[index]) * 255
+        )
+        return mask
+
+    def get_contour(self, index: int) -> NDArray:
+        """
+        Finds the outer contour of a blob, which can be used with the contour
+        functions such as draw_contour.
+
+        Args:
+            index: The index of the blob, where 0 is the largest.
+
+        Example::
+
+            # Draw the outline of the largest blob
+            if len(blobs) > 0:
+                rc_utils.draw_contour(image, blobs.get_contour(0))
+        """
+        assert (
+            0 <= index < len(self)
+        ), f"index ({index}) must be less than the number of blobs ({len(self)})."
+
+        # Only search the bounding box of the blob
+        (top, left, bottom, right) = self.__bounding_boxes[index]
+        (row, column) = self.__origin
+        mask = np.uint8(
+            self.__labels[top - row : bottom - row, left - column : right - column]
+            == self.__label_ids[index]
+        )
+        contours = cv.findContours(
+            mask,
+            cv.RETR_EXTERNAL,
+            cv.CHAIN_APPROX_SIMPLE,
+            offset=(int(left), int(top)),
+        )[0]
+        return max(contours, key=len)
+
+
+def find_blobs(
+    mask: NDArray[(Any, Any), np.uint8],
+    min_area: int = 30,
+    external_only: bool = False,
+    roi: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None,
+) -> Blobs:
+    """
+    Finds the connected regions of nonzero pixels in a mask, and measures all of them
+    in a single pass.
+
+    Args:
+        mask: The mask in which to find blobs, such as one returned by
+            ColorClassifier.get_masks.
+        min_area: The smallest blob to keep (in number of pixels).
+        external_only: If True, holes inside each blob are counted as part of the blob,
+            and blobs inside the holes of another blob are merged into it, in the same
+            way as the outer contours returned by find_contours.
+        roi: The (top_left_inclusive, bottom_right_exclusive) corners of the region
+            of the mask to search, as passed to crop, or None to search the entire
+            mask. The blobs are measured in the coordinates of the full mask.
+
+    Returns:
+        The blobs with at least min_area pixels, sorted from largest to smallest.
+
+    Note:
+        This is faster than finding contours and then calling get_largest_contour,
+        get_contour_center, and get_contour_area, which each measure the contours
+        again. Unlike a contour, the area of a blob is its exact number of pixels.
+
+    Example::
+
+        # Find the blobs of blue in the current image
+        image = rc.camera.get_color_image()
+        mask = cv.inRange(
+            cv.cvtColor(image, cv.COLOR_BGR2HSV), (90, 50, 50), (120, 255, 255)
+        )
+        blobs = rc_utils.find_blobs(mask)
+
+        # Find the center of the largest blob if there is one
+        if len(blobs) > 0:
+            center = blobs.get_centers()[0]
+    """
+    full_shape = mask.shape
+    (mask, origin) = _crop_to_roi(mask, roi)
+
+    if external_only:
+        # Mark the background reachable from outside of the image, so everything
+        # else is either a blob or a hole inside a blob
+        background = cv.copyMakeBorder(
+            np.uint8(mask > 0), 1, 1, 1, 1, cv.BORDER_CONSTANT, value=0
+        )
+        cv.floodFill(background, None, (0, 0), 2)
+        mask = np.uint8(background[1:-1, 1:-1] != 2)
+
+    (_, labels, stats, centroids) = cv.connectedComponentsWithStats(
+        mask, connectivity=8
+    )
+
+    # Label 0 is the background, and the remaining labels are kept if large enough
+    areas = stats[1:, cv.CC_STAT_AREA]
+    label_ids = np.flatnonzero(areas >= min_area) + 1
+    label_ids = label_ids[np.argsort(-areas[label_ids - 1], kind="stable")]
+    return Blobs(
+        labels, label_ids, stats[label_ids], centroids[label_ids], origin, full_shape
+    )
+
+
+class ContourTracker:
+    """
+    Follows the largest contour of a color range from frame to frame, searching only
+    a window around where the contour is expected to be based on its last position
+    and velocity.
+
+    If the contour is not found in the window, or extends past its edge, the entire
+    image is searched instead, as find_contours and get_largest_contour would.
+    """
+
+    def __init__(
+        self,
+        hsv_lower: Tuple[int, int, int],
+        hsv_upper: Tuple[int, int, int],
+        min_area: int = 30,
+        margin: float = 0.5,
+        min_margin: int = 16,
+    ) -> None:
+        """
+        Creates a tracker which is not yet following a contour.
+
+        Args:
+            hsv_lower: The lower bound for the hue, saturation, and value of the color
+                to track.
+            hsv_upper: The upper bound for the hue, saturation, and value of the color
+                to track.
+            min_area: The smallest contour to track (in number of pixels).
+            margin: The amount by which the search window extends past each side of
+                the predicted bounding box, as a fraction of its height or width.
+            min_margin: The smallest amount by which the search window extends past
+                each side of the predicted bounding box (in number of pixels).
+
+        Example::
+
+            # Create the tracker once, outside of update
+            ORANGE = ((10, 100, 100), (20, 255, 255))
+            tracker = rc_utils.ContourTracker(ORANGE[0], ORANGE[1])
+
+            # In update, find the cone near where it was last frame
+            contour = tracker.update(rc.camera.get_color_image())
+            if contour is not None:
+                center = tracker.get_center()
+        """
+        _check_hsv_range(hsv_lower, hsv_upper)
+        assert margin >= 0, f"margin ({margin}) cannot be negative."
+        assert min_margin >= 0, f"min_margin ({min_margin}) cannot be negative."
+
+        self.__hsv_lower: Tuple[int, int, int] = hsv_lower
+        self.__hsv_upper: Tuple[int, int, int] = hsv_upper
+        self.__min_area: int = min_area
+        self.__margin: float = margin
+        self.__min_margin: int = min_margin
+
+        self.__contour: Optional[NDArray] = None
+        self.__center: Optional[Tuple[int, int]] = None
+        self.__bounding_box: Optional[Tuple[int, int, int, int]] = None
+        self.__velocity: Tuple[int, int] = (0, 0)
+
+    def update(
+        self, color_image: NDArray[(Any, Any, 3), np.uint8]
+    ) -> Optional[NDArray]:
+        """
+        Finds the tracked contour in the next image.
+
+        Args:
+            color_image: The color image in which to find the contour, with pixels
+                represented in the bgr (blue-green-red) format.
+
+        Returns:
+            The contour, in the coordinates of the full image, or None if no contour of
+            the color was larger than min_area.
+
+        Note:
+            While a contour is being tracked, a larger contour of the same color
+            elsewhere in the image is ignored until the tracked contour is lost.
+        """
+        contour: Optional[NDArray] = None
+
+        window = self.__get_search_window(color_image.shape)
+        if window is not None:
+            contours = find_contours(
+                color_image, self.__hsv_lower, self.__hsv_upper, roi=window
+            )
+            contour = get_largest_contour(contours, self.__min_area)
+
+            # A contour cut off by the window may be larger than what was found
+            if contour is not None and self.__is_clipped(
+                contour, window, color_image.shape
+            ):
+                contour = None
+
+        if contour is None:
+            contours = find_contours(color_image, self.__hsv_lower, self.__hsv_upper)
+            contour = get_largest_contour(contours, self.__min_area)
+
+        self.__set_contour(contour)
+        return contour
+
+    def reset(self) -> None:
+        """
+        Stops following the current contour, so the next update searches the entire
+        image.
+        """
+        self.__set_contour(None)
+
+    def get_contour(self) -> Optional[NDArray]:
+        """
+        Returns the contour found by the last update, or None if none was found.
+        """
+        return self.__contour
+
+    def get_center(self) -> Optional[Tuple[int, int]]:
+        """
+        Returns the (row, column) of the center of the contour found by the last
+        update, or None if none was found.
+        """
+        return self.__center
+
+    def get_area(self) -> float:
+        """
+        Returns the area of the contour found by the last update, or 0 if none was
+        found.
+        """
+        return get_contour_area(self.__contour) if self.__contour is not None else 0
+
+    def get_bounding_box(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Returns the (top, left, bottom, right) of the contour found by the last update
+        in the format used by Blobs.get_bounding_boxes, or None if none was found.
+        """
+        return self.__bounding_box
+
+    def __set_contour(self, contour: Optional[NDArray]) -> None:
+        if contour is None:
+            self.__contour = None
+            self.__center = None
+            self.__bounding_box = None
+            self.__velocity = (0, 0)
+            return
+
+        (left, top, width, height) = cv.boundingRect(contour)
+        center = get_contour_center(contour)
+        if self.__center is not None and center is not None:
+            self.__velocity = (
+                center[0] - self.__center[0],
+                center[1] - self.__center[1],
+            )
+        self.__contour = contour
+        self.__center = center
+        self.__bounding_box = (top, left, top + height, left + width)
+
+    def __get_search_window(
+        self, shape: Tuple[int, ...]
+    ) -> Optional[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """
+        Returns the region around the predicted bounding box of the contour, or None
+        if there is no prediction.
+        """
+        if self.__bounding_box is None:
+            return None
+
+        # Move the last bounding box by the last velocity, then expand it
+        (top, left, bottom, right) = self.__bounding_box
+        (row_velocity, column_velocity) = self.__velocity
+        row_margin = max(self.__min_margin, round((bottom - top) * self.__margin))
+        column_margin = max(self.__min_margin, round((right - left) * self.__margin))
+
+        top = max(0, top + row_velocity - row_margin)
+        left = max(0, left + column_velocity - column_margin)
+        bottom = min(shape[0], bottom + row_velocity + row_margin)
+        right = min(shape[1], right + column_velocity + column_margin)
+        if top >= bottom or left >= right:
+            return None
+        return ((top, left), (bottom, right))
+
+    @staticmethod
+    def __is_clipped(
+        contour: NDArray,
+        window: Tuple[Tuple[int, int], Tuple[int, int]],
+        shape: Tuple[int, ...],
+    ) -> bool:
+        """
+        Returns whether a contour touches an edge of the window which is not also an
+        edge of the image.
+        """
+        ((top, left), (bottom, right)) = window
+        (contour_left, contour_top, width, height) = cv.boundingRect(contour)
+        return (
+            (top > 0 and contour_top <= top)
+            or (left > 0 and contour_left <= left)
+            or (bottom < shape[0] and contour_top + height >= bottom)
+            or (right < shape[1] and contour_left + width >= right)
+        )
+
+
+def find_line_centroids(
+    color_image: NDArray[(Any, Any, 3), np.uint8],
+    hsv_lower: Tuple[int, int, int],
+    hsv_upper: Tuple[int, int, int],
+    rows: Sequence[int],
+    band_height: int = 8,
+) -> Tuple[NDArray[(Any,), np.float64], NDArray[(Any,), np.int64]]:
+    """
+    Finds the horizontal position of a colored line in several horizontal bands of an
+    image, without finding any contours.
+
+    Args:
+        color_image: The color image in which to find the line, with pixels
+            represented in the bgr (blue-green-red) format.
+        hsv_lower: The lower bound for the hue, saturation, and value of the line.
+        hsv_upper: The upper bound for the hue, saturation, and value of the line.
+        rows: The pixel row at the center of each band.
+        band_height: The number of pixel rows in each band.
+
+    Returns:
+        A tuple containing the average column of the pixels of the line color in each
+        band (or NaN if the band has none) and the number of such pixels in each
+        band, in the order of rows.
+
+    Note:
+        Only the pixels inside the bands are converted and thresholded, so this is
+        much faster than find_contours when only the position of the line is needed.
+
+    Example::
+
+        # Find the blue line in three bands near the bottom of the image
+        BLUE = ((90, 50, 50), (120, 255, 255))
+        ROWS = (380, 420, 460)
+        (columns, counts) = rc_utils.find_line_centroids(
+            rc.camera.get_color_image(), BLUE[0], BLUE[1], ROWS
+        )
+
+        # Steer toward the line in the closest band in which it was found
+        if counts[-1] > 0:
+            angle = rc_utils.remap_range(columns[-1], 0, rc.camera.get_width(), -1, 1)
+    """
+    assert band_height > 0, f"band_height ({band_height}) must be positive."
+    assert len(rows) > 0, "rows must contain at least one row."
+
+    # Gather the rows of every band into one short image, clamped to the image edges
+    offsets = np.arange(band_height) - band_height // 2
+    band_rows = np.clip(
+        np.asarray(rows).reshape(-1, 1) + offsets, 0, color_image.shape[0] - 1
+    )
+    bands = color_image[band_rows.ravel()]
+
+    mask = _get_hsv_mask(cv.cvtColor(bands, cv.COLOR_BGR2HSV), hsv_lower, hsv_upper)
+
+    # Count the line pixels (255 in the mask) in each column of each band, then take
+    # the average column
+    column_counts = (
+        mask.reshape(len(rows), band_height, -1).sum(axis=1, dtype=np.int64) // 255
+    )
+    counts = column_counts.sum(axis=1)
+    columns = (column_counts @ np.arange(column_counts.shape[1])) / np.maximum(
+        counts, 1
+    )
+    columns[counts == 0] = np.nan
+    return (columns, counts)
+
+
+def get_line_heading(
+    rows: Sequence[int],
+    columns: NDArray[(Any,), np.float64],
+    counts: NDArray[(Any,), np.int64],
+) -> Optional[float]:
+    """
+    Fits a straight line through the centroids returned by find_line_centroids.
+
+    Args:
+        rows: The pixel row at the center of each band.
+        columns: The average column of the line in each band.
+        counts: The number of pixels of the line in each band, which weights the fit.
+
+    Returns:
+        The angle of the line in degrees, where 0 is straight up the image and a
+        positive angle means the line leans to the right as it gets further from the
+        car, or None if the line was found in fewer than two bands.
+
+    Example::
+
+        ROWS = (380, 420, 460)
+        (columns, counts) = rc_utils.find_line_centroids(image, BLUE[0], BLUE[1], ROWS)
+        heading = rc_utils.get_line_heading(ROWS, columns, counts)
+    """
+    found = counts > 0
+    if np.count_nonzero(found) < 2:
+        return None
+
+    # Weighted least squares fit of column = slope * row + intercept
+    found_rows = np.asarray(rows, np.float64)[found]
+    weights = counts[found]
+    mean_row = np.average(found_rows, weights=weights)
+    mean_column = np.average(columns[found], weights=weights)
+    row_deviations = found_rows - mean_row
+    variance = np.sum(weights * row_deviations ** 2)
+    if variance == 0:
+        return None
+    slope = np.sum(weights * row_deviations * (columns[found] - mean_column)) / variance
+
+    # Rows increase down the image, so moving away from the car is a negative step
+    return math.degrees(math.atan(-slope))
+
+
 ########################################################################################
 # Depth Images
 ########################################################################################
@@ -642,6 +1643,7 @@ def get_pixel_average_distance(
     depth_image: NDArray[(Any, Any), np.float32],
     pix_coord: Tuple[int, int],
     kernel_size: int = 5,
+    scale: int = 1,
 ) -> float:
     """
     Finds the distance of a pixel averaged with its neighbors in a depth image.
@@ -650,6 +1652,8 @@ def get_pixel_average_distance(
         depth_image: The depth image to process.
         pix_coord: The (row, column) of the pixel to measure.
         kernel_size: The size of the area to average around the pixel.
+        scale: The factor by which depth_image is smaller than the full resolution
+            image, as returned by rc.camera.get_depth_image_native().
 
     Returns:
         The distance in cm of the object at the provided pixel.
@@ -668,7 +1672,20 @@ def get_pixel_average_distance(
 
         # Find the distance of the object (in cm) at the pixel (100, 20) of depth_image
         average_distance = rc_utils.get_average_distance(depth_image, 100, 20)
+
+        # Find the same distance without upsampling the depth image
+        (native_image, scale) = rc.camera.get_depth_image_native()
+        average_distance = rc_utils.get_pixel_average_distance(
+            native_image, (100, 20), scale=scale
+        )
     """
+    assert scale >= 1, f"scale ({scale}) must be a positive integer."
+
+    # pix_coord and kernel_size are measured in full resolution pixels
+    if scale > 1:
+        pix_coord = (pix_coord[0] // scale, pix_coord[1] // scale)
+        kernel_size = (kernel_size // scale) | 1
+
     (pix_row, pix_col) = pix_coord
     assert (
         0 <= pix_row < depth_image.shape[0]
@@ -711,7 +1728,7 @@ def get_pixel_average_distance(
 
 
 def get_closest_pixel(
-    depth_image: NDArray[(Any, Any), np.float32], kernel_size: int = 5
+    depth_image: NDArray[(Any, Any), np.float32], kernel_size: int = 5, scale: int = 1
 ) -> Tuple[int, int]:
     """
     Finds the closest pixel in a depth image.
@@ -719,9 +1736,12 @@ def get_closest_pixel(
     Args:
         depth_image: The depth image to process.
         kernel_size: The size of the area to average around each pixel.
+        scale: The factor by which depth_image is smaller than the full resolution
+            image, as returned by rc.camera.get_depth_image_native().
 
     Returns:
-        The (row, column) of the pixel which is closest to the car.
+        The (row, column) of the pixel which is closest to the car, at full
+        resolution.
 
     Warning:
         kernel_size be positive and odd.
@@ -744,23 +1764,33 @@ def get_closest_pixel(
 
         # Find the closest pixel
         closest_pixel = rc_utils.get_closest_pixel(depth_image)
+
+        # Find the closest pixel without upsampling the depth image
+        (native_image, scale) = rc.camera.get_depth_image_native()
+        closest_pixel = rc_utils.get_closest_pixel(native_image, scale=scale)
     """
     assert (
         kernel_size > 0 and kernel_size % 2 == 1
     ), f"kernel_size ({kernel_size}) must positive and odd."
+    assert scale >= 1, f"scale ({scale}) must be a positive integer."
+
+    # kernel_size is measured in full resolution pixels
+    kernel_size = (kernel_size // scale) | 1
 
     # Shift 0.0 values to 10,000 so they are not considered for the closest pixel
     depth_image = (depth_image - 0.01) % 10000
 
     # Apply a Gaussian blur to to reduce noise
+    blurred_image = depth_image
     if kernel_size > 1:
         blurred_image = cv.GaussianBlur(depth_image, (kernel_size, kernel_size), 0)
 
     # Find the pixel location of the minimum depth
     (_, _, minLoc, _) = cv.minMaxLoc(blurred_image)
 
-    # minLoc is formatted as (column, row), so we flip the order
-    return (minLoc[1], minLoc[0])
+    # minLoc is formatted as (column, row), so we flip the order, and return the
+    # center of the full resolution pixels which it covers
+    return (minLoc[1] * scale + scale // 2, minLoc[0] * scale + scale // 2)
 
 
 def colormap_depth_image(
@@ -1049,12 +2079,20 @@ class ARMarker:
             min(color_image.shape[0], marker_bottom + half_marker_height) + 1,
             min(color_image.shape[1], marker_right + half_marker_width) + 1,
         )
-        cropped_image = crop(color_image, crop_top_left, crop_bottom_right)
+        if _frame_cache is not None:
+            # Crop the hsv version of the whole image, which is shared by every marker
+            hsv_image = crop(
+                _convert_to_hsv(color_image), crop_top_left, crop_bottom_right
+            )
+        else:
+            cropped_image = crop(color_image, crop_top_left, crop_bottom_right)
+            hsv_image = cv.cvtColor(cropped_image, cv.COLOR_BGR2HSV)
 
         # Attempt to find each color in the cropped area, and choose the color of which
         # we see the most
         for (hsv_lower, hsv_upper, color_name) in potential_colors:
-            contours = find_contours(cropped_image, hsv_lower, hsv_upper)
+            mask = _get_hsv_mask(hsv_image, hsv_lower, hsv_upper)
+            contours = cv.findContours(mask, cv.RETR_LIST, cv.CHAIN_APPROX_SIMPLE)[0]
             largest_contour = get_largest_contour(contours)
             if largest_contour is not None:
                 contour_area = get_contour_area(largest_contour)
@@ -1082,12 +2120,8 @@ class ARMarker:
         """
         Returns the corners of the AR marker formatted as needed by the ArUco library.
         """
-        output = self.__corners.astype(np.float32).reshape(1, 4, 2)
-        for i in range(4):
-            row = output[0][i][0]
-            output[0][i][0] = output[0][i][1]
-            output[0][i][1] = row
-        return output
+        # Swap each (row, col) to (x, y)
+        return self.__corners[:, ::-1].astype(np.float32).reshape(1, 4, 2)
 
     def get_orientation(self) -> Orientation:
         """
@@ -1112,6 +2146,135 @@ class ARMarker:
         return output + self.__color
 
 
+class ARMarkerDetector:
+    """
+    Finds AR markers in color images, creating the ArUco dictionary and detector
+    parameters once rather than for every image.
+    """
+
+    class Preset(IntEnum):
+        """
+        Sets of detector parameters which trade the ability to find small or poorly
+        lit markers for speed.
+
+        Note:
+            default uses the ArUco default parameters. fast thresholds the image at two
+            window sizes instead of three and ignores markers whose perimeter is less
+            than 5% of the image size. fastest thresholds the image once and ignores
+            markers whose perimeter is less than 8% of the image size.
+        """
+
+        default = 0
+        fast = 1
+        fastest = 2
+
+    # The detector parameters changed from the ArUco defaults by each preset
+    __PRESET_PARAMETERS: Dict[Preset, Dict[str, Any]] = {
+        Preset.default: {},
+        Preset.fast: {
+            "adaptiveThreshWinSizeMin": 5,
+            "adaptiveThreshWinSizeMax": 15,
+            "adaptiveThreshWinSizeStep": 10,
+            "minMarkerPerimeterRate": 0.05,
+        },
+        Preset.fastest: {
+            "adaptiveThreshWinSizeMin": 11,
+            "adaptiveThreshWinSizeMax": 11,
+            "adaptiveThreshWinSizeStep": 10,
+            "minMarkerPerimeterRate": 0.08,
+        },
+    }
+
+    def __init__(
+        self,
+        preset: Preset = Preset.default,
+        dictionary: Optional[int] = None,
+    ) -> None:
+        """
+        Creates a detector for the markers of an ArUco dictionary.
+
+        Args:
+            preset: The set of detector parameters to use.
+            dictionary: The ArUco dictionary of the markers to find, or None for
+                cv.aruco.DICT_6X6_250.
+
+        Example::
+
+            # Create the detector once, outside of update
+            detector = rc_utils.ARMarkerDetector(rc_utils.ARMarkerDetector.Preset.fast)
+
+            # In update, find the markers in the current color image
+            markers = detector.detect_markers(rc.camera.get_color_image())
+        """
+        if dictionary is None:
+            dictionary = cv.aruco.DICT_6X6_250
+
+        # OpenCV 4.7 replaced the ArUco functions with a detector object
+        if hasattr(cv.aruco, "ArucoDetector"):
+            self.__dictionary = cv.aruco.getPredefinedDictionary(dictionary)
+            self.__parameters = cv.aruco.DetectorParameters()
+        else:
+            self.__dictionary = cv.aruco.Dictionary_get(dictionary)
+            self.__parameters = cv.aruco.DetectorParameters_create()
+
+        for (name, value) in self.__PRESET_PARAMETERS[preset].items():
+            setattr(self.__parameters, name, value)
+
+        self.__detector = (
+            cv.aruco.ArucoDetector(self.__dictionary, self.__parameters)
+            if hasattr(cv.aruco, "ArucoDetector")
+            else None
+        )
+
+    def detect_markers(
+        self,
+        color_image: NDArray[(Any, Any, 3), np.uint8],
+        potential_colors: List[
+            Tuple[Tuple[int, int, int], Tuple[int, int, int], str]
+        ] = None,
+    ) -> List[ARMarker]:
+        """
+        Finds AR markers in a image.
+
+        Args:
+            color_image: The color image in which to search for AR markers.
+            potential_colors: The potential colors of the AR marker, each represented
+                as (hsv_min, hsv_max, color_name)
+
+        Returns:
+            An ARMarker for each marker found in the image.
+        """
+        # Use ArUco to find the raw corner and id information
+        if self.__detector is not None:
+            (corners, ids, _) = self.__detector.detectMarkers(color_image)
+        else:
+            (corners, ids, _) = cv.aruco.detectMarkers(
+                color_image, self.__dictionary, parameters=self.__parameters
+            )
+
+        if len(corners) == 0:
+            return []
+
+        # Rearrange every corner point from (x, y) into the (row, col) format at once
+        all_corners = np.concatenate(corners).astype(np.int32)[:, :, ::-1]
+
+        # Create an ARMarker object for each detected marker
+        markers: List[ARMarker] = []
+        for i in range(len(all_corners)):
+            marker = ARMarker(ids[i][0], np.ascontiguousarray(all_corners[i]))
+
+            # Detect potential colors, if provided
+            if potential_colors is not None and len(potential_colors) > 0:
+                marker.detect_colors(color_image, potential_colors)
+
+            markers.append(marker)
+        return markers
+
+
+# The detector used by get_ar_markers, which is created when it is first needed
+_ar_marker_detector: Optional[ARMarkerDetector] = None
+
+
 def get_ar_markers(
     color_image: NDArray[(Any, Any, 3), np.uint8],
     potential_colors: List[
@@ -1129,6 +2292,10 @@ def get_ar_markers(
     Returns:
         A list of each AR marker's four corners clockwise and an array of the AR marker ids.
 
+    Note:
+        This uses a shared ARMarkerDetector with the default parameters. Create an
+        ARMarkerDetector to use faster parameters or another dictionary.
+
     Example::
 
         # Detect the AR markers in the current color image
@@ -1139,31 +2306,10 @@ def get_ar_markers(
         if len(markers) >= 1:
             print(markers[0])
     """
-    # Use ArUco to find the raw corner and id information
-    corners, ids, _ = cv.aruco.detectMarkers(
-        color_image,
-        cv.aruco.Dictionary_get(cv.aruco.DICT_6X6_250),
-        parameters=cv.aruco.DetectorParameters_create(),
-    )
-
-    # Create an ARMarker object for each detected marker
-    markers: List[ARMarker] = []
-    for i in range(len(corners)):
-        # Rearrange each corner point into the (row, col) format
-        corners_formatted = corners[i][0].astype(np.int32)
-        for j in range(corners_formatted.shape[0]):
-            col = corners_formatted[j][0]
-            corners_formatted[j][0] = corners_formatted[j][1]
-            corners_formatted[j][1] = col
-
-        marker = ARMarker(ids[i][0], corners_formatted)
-
-        # Detect potential colors, if provided
-        if potential_colors is not None and len(potential_colors) > 0:
-            marker.detect_colors(color_image, potential_colors)
-
-        markers.append(marker)
-    return markers
+    global _ar_marker_detector
+    if _ar_marker_detector is None:
+        _ar_marker_detector = ARMarkerDetector()
+    return _ar_marker_detector.detect_markers(color_image, potential_colors)
 
 
 def draw_ar_markers(
@@ -21,8 +21,10 @@ import display_real
 import drive_real
 import lidar_real
 import physics_real
+import profiling
 
 from racecar_core import Racecar
+import racecar_utils as rc_utils
 
 
 class RacecarReal(Racecar):
@@ -45,6 +47,7 @@ class RacecarReal(Racecar):
         self.drive = drive_real.DriveReal()
         self.lidar = lidar_real.LidarReal()
         self.physics = physics_real.PhysicsReal()
+        self.profiler = profiling.FrameProfiler(1 / self.__FRAME_RATE)
 
         # Add all nodes to the executor
         rate_added = self.__executor.add_node(self.__rate_node)
@@ -160,17 +163,25 @@ class RacecarReal(Racecar):
         while True:
             self.__last_frame_time = self.__cur_frame_time
             self.__cur_frame_time = datetime.now()
+            self.profiler.start_phase("update")
             self.__cur_update()
+            self.profiler.start_phase("modules")
             self.__update_modules()
 
             # Use a counter to decide when we need to call update_slow
             if self.__cur_update_slow is not None:
                 self.__cur_update_counter -= 1
                 if self.__cur_update_counter <= 0:
+                    self.profiler.start_phase("update_slow")
                     self.__cur_update_slow()
                     self.__cur_update_counter = self.__max_update_counter
 
+            # Images processed during this frame are replaced by the next frame
+            rc_utils.clear_frame_cache()
+
+            self.profiler.start_phase("sleep")
             rate.sleep()
+            self.profiler.end_frame()
 
     def __update_modules(self):
         """
@@ -1,69 +1,277 @@
 import sys
+import copy
+import struct
 import numpy as np
 import cv2 as cv
 from nptyping import NDArray
+from typing import Any, Optional, Tuple
 
 from camera import Camera
+from shared_memory_sim import SharedMemorySim
 
 
 class CameraSim(Camera):
     def __init__(self, racecar) -> None:
         self.__racecar = racecar
-        self.__color_image: NDArray[(480, 640, 3), np.uint8] = None
-        self.__is_color_image_current: bool = False
+
+        # The full resolution depth image, and the native image it was upsampled from
         self.__depth_image: NDArray[(480, 640), np.float32] = None
-        self.__is_depth_image_current: bool = False
+        self.__depth_image_source: NDArray[(Any, Any), np.float32] = None
 
         self._MAX_DEPTH_WIDTH: int = self._WIDTH // 8
         self._MAX_DEPTH_HEIGHT: int = self._HEIGHT // 8
 
-    def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
-        if not self.__is_color_image_current:
-            self.__color_image = self.__request_color_image(False)
-            self.__is_color_image_current = True
+    def get_color_image(
+        self,
+        roi: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None,
+        scale: int = 1,
+        pixel_format: Camera.PixelFormat = Camera.PixelFormat.bgr,
+    ) -> NDArray[(Any, ...), np.uint8]:
+        # Crop and convert the full image locally if it was already received this
+        # frame, or if RacecarSim cannot send part of the image
+        if (
+            (roi is None and scale == 1 and pixel_format == self.PixelFormat.bgr)
+            or self.__racecar._RacecarSim__cache.contains(
+                self.__racecar.Header.camera_get_color_image
+            )
+            or not self.__racecar._RacecarSim__features
+            & (
+                self.__racecar.Feature.color_region
+                | self.__racecar.Feature.pixel_format
+            )
+        ):
+            return Camera.get_color_image(self, roi, scale, pixel_format)
+
+        ((top, left), (bottom, right)) = (
+            roi if roi is not None else ((0, 0), (self._HEIGHT, self._WIDTH))
+        )
+        bottom = min(bottom, self._HEIGHT)
+        right = min(right, self._WIDTH)
+        assert (
+            0 <= top < bottom and 0 <= left < right
+        ), f"roi ({roi}) must contain at least one pixel of the image."
+        assert scale >= 1, f"scale ({scale}) must be a positive integer."
 
-        return self.__color_image
+        region = self.__racecar._RacecarSim__cache.get(
+            (
+                self.__racecar.Header.camera_get_color_image_format,
+                top,
+                left,
+                bottom,
+                right,
+                scale,
+                pixel_format,
+            ),
+            lambda: self.__request_color_region(
+                top, left, bottom, right, scale, pixel_format
+            ),
+        )
+        return copy.deepcopy(region)
+
+    def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
+        return self.__racecar._RacecarSim__cache.get(
+            self.__racecar.Header.camera_get_color_image,
+            lambda: self.__request_color_image(False),
+        )
 
     def get_color_image_async(self) -> NDArray[(480, 640, 3), np.uint8]:
         return self.__request_color_image(True)
 
     def get_depth_image(self) -> NDArray[(480, 640), np.float32]:
-        if not self.__is_depth_image_current:
-            self.__depth_image = self.__request_depth_image(False)
-            self.__is_depth_image_current = False
+        (depth_image, _) = self.get_depth_image_native()
 
+        # Only upsample the depth image once it is needed at full resolution
+        if self.__depth_image_source is not depth_image:
+            self.__depth_image = self.__upsample_depth_image(depth_image)
+            self.__depth_image_source = depth_image
         return self.__depth_image
 
     def get_depth_image_async(self) -> NDArray[(480, 640), np.float32]:
-        return self.__request_depth_image(True)
+        return self.__upsample_depth_image(self.__request_depth_image(True))
 
-    def __update(self) -> None:
-        self.__is_color_image_current = False
-        self.__is_depth_image_current = False
+    def get_depth_image_native(self) -> Tuple[NDArray[(Any, Any), np.float32], int]:
+        depth_image = self.__racecar._RacecarSim__cache.get(
+            self.__racecar.Header.camera_get_depth_image,
+            lambda: self.__request_depth_image(False),
+        )
+        return (depth_image, self._WIDTH // depth_image.shape[1])
 
-    def __request_color_image(self, isAsync: bool) -> NDArray[(480, 640), np.uint8]:
-        # Ask for a the current color image
-        self.__racecar._RacecarSim__send_header(
-            self.__racecar.Header.camera_get_color_image, isAsync
+    def __load_color_image(self, raw_bytes: memoryview) -> None:
+        self.__racecar._RacecarSim__cache.set(
+            self.__racecar.Header.camera_get_color_image,
+            self.__decode_color_image(
+                raw_bytes, pixel_format=self.__get_full_image_format()
+            ),
         )
 
-        # Read the color image as 32 packets
-        raw_bytes = self.__racecar._RacecarSim__receive_fragmented(
-            32, self._WIDTH * self._HEIGHT * 4, isAsync
+    def __load_depth_image(self, raw_bytes: memoryview) -> None:
+        self.__racecar._RacecarSim__cache.set(
+            self.__racecar.Header.camera_get_depth_image,
+            self.__decode_depth_image(raw_bytes),
         )
-        color_image = np.frombuffer(raw_bytes, dtype=np.uint8)
-        color_image = np.reshape(color_image, (self._HEIGHT, self._WIDTH, 4), "C")
 
-        color_image = cv.cvtColor(color_image, cv.COLOR_RGB2BGR)
+    def __request_color_image(self, isAsync: bool) -> NDArray[(480, 640), np.uint8]:
+        pixel_format = self.__get_full_image_format()
+        if pixel_format is None:
+            (num_fragments, fragment_size) = (32, self._WIDTH * self._HEIGHT * 4 // 32)
+        else:
+            (num_fragments, fragment_size) = self.__get_layout(
+                self._HEIGHT, self._WIDTH, pixel_format
+            )
+
+        with self.__racecar._RacecarSim__exchange():
+            if pixel_format is None:
+                # Ask for a the current color image
+                self.__racecar._RacecarSim__send_header(
+                    self.__racecar.Header.camera_get_color_image, isAsync
+                )
+            else:
+                # Ask for the entire color image, already in BGR
+                self.__send_format_request(
+                    0, 0, self._HEIGHT, self._WIDTH, 1, pixel_format, isAsync
+                )
+
+            # Read the color image into the racecar's reusable receive buffer, or as a
+            # view of shared memory
+            raw_bytes = self.__racecar._RacecarSim__receive_block(
+                SharedMemorySim.Stream.color_image,
+                num_fragments,
+                num_fragments * fragment_size,
+                isAsync,
+            )
+            return self.__decode_color_image(raw_bytes, pixel_format=pixel_format)
+
+    def __request_color_region(
+        self,
+        top: int,
+        left: int,
+        bottom: int,
+        right: int,
+        scale: int,
+        pixel_format: Camera.PixelFormat,
+    ) -> NDArray[(Any, ...), np.uint8]:
+        # Without pixel format support, the region is sent as RGBA and converted here
+        received_format: Optional[Camera.PixelFormat] = None
+        if self.__racecar._RacecarSim__features & self.__racecar.Feature.pixel_format:
+            received_format = pixel_format
+
+        # The region contains every scale-th row and column, starting with the first
+        rows = -(-(bottom - top) // scale)
+        cols = -(-(right - left) // scale)
+        (num_fragments, fragment_size) = self.__get_layout(rows, cols, received_format)
+
+        with self.__racecar._RacecarSim__exchange():
+            if received_format is not None:
+                self.__send_format_request(
+                    top, left, bottom, right, scale, pixel_format
+                )
+            else:
+                self.__racecar._RacecarSim__send_data(
+                    struct.pack(
+                        "BHHHHB",
+                        self.__racecar.Header.camera_get_color_image_region.value,
+                        top,
+                        left,
+                        bottom,
+                        right,
+                        scale,
+                    )
+                )
+
+            raw_bytes = self.__racecar._RacecarSim__receive_block(
+                SharedMemorySim.Stream.color_image,
+                num_fragments,
+                num_fragments * fragment_size,
+            )
+            color_image = self.__decode_color_image(
+                raw_bytes, rows, cols, received_format
+            )
+
+        if received_format is None and pixel_format in self._CONVERSIONS:
+            color_image = cv.cvtColor(color_image, self._CONVERSIONS[pixel_format])
         return color_image
 
-    def __request_depth_image(self, isAsync: bool) -> NDArray[(480, 640), np.float32]:
-        self.__racecar._RacecarSim__send_header(
-            self.__racecar.Header.camera_get_depth_image, isAsync
+    def __send_format_request(
+        self,
+        top: int,
+        left: int,
+        bottom: int,
+        right: int,
+        scale: int,
+        pixel_format: Camera.PixelFormat,
+        is_async: bool = False,
+    ) -> None:
+        self.__racecar._RacecarSim__send_data(
+            struct.pack(
+                "BBHHHHB",
+                self.__racecar.Header.camera_get_color_image_format.value,
+                pixel_format.value,
+                top,
+                left,
+                bottom,
+                right,
+                scale,
+            ),
+            is_async,
         )
-        raw_bytes: bytes = self.__racecar._RacecarSim__receive_data(
-            self._MAX_DEPTH_WIDTH * self._MAX_DEPTH_HEIGHT * 4
+
+    def __get_full_image_format(self) -> Optional[Camera.PixelFormat]:
+        """
+        Returns the format in which RacecarSim sends full color images, with None
+        representing the RGBA format of the original protocol.
+        """
+        if self.__racecar._RacecarSim__features & self.__racecar.Feature.pixel_format:
+            return self.PixelFormat.bgr
+        return None
+
+    def __get_layout(
+        self, rows: int, cols: int, pixel_format: Optional[Camera.PixelFormat]
+    ) -> Tuple[int, int]:
+        return self.__racecar._RacecarSim__get_fragment_layout(
+            rows * cols * self.__get_channels(pixel_format)
         )
+
+    def __get_channels(self, pixel_format: Optional[Camera.PixelFormat]) -> int:
+        if pixel_format is None:
+            return 4
+        return 1 if pixel_format == self.PixelFormat.gray else 3
+
+    def __decode_color_image(
+        self,
+        raw_bytes: memoryview,
+        rows: int = Camera._HEIGHT,
+        cols: int = Camera._WIDTH,
+        pixel_format: Optional[Camera.PixelFormat] = None,
+    ) -> NDArray[(Any, ...), np.uint8]:
+        channels = self.__get_channels(pixel_format)
+        color_image = np.frombuffer(raw_bytes[: rows * cols * channels], dtype=np.uint8)
+
+        # The receive buffer is reused by the next request, so the conversion from RGBA
+        # to BGR doubles as the single copy of the frame
+        if pixel_format is None:
+            color_image = np.reshape(color_image, (rows, cols, 4), "C")
+            return cv.cvtColor(color_image, cv.COLOR_RGB2BGR)
+
+        # Other formats are sent ready to use, and only need to be copied
+        shape = (rows, cols) if channels == 1 else (rows, cols, channels)
+        return np.reshape(color_image, shape, "C").copy()
+
+    def __request_depth_image(self, isAsync: bool) -> NDArray[(Any, Any), np.float32]:
+        with self.__racecar._RacecarSim__exchange():
+            self.__racecar._RacecarSim__send_header(
+                self.__racecar.Header.camera_get_depth_image, isAsync
+            )
+            raw_bytes = self.__racecar._RacecarSim__receive_block(
+                SharedMemorySim.Stream.depth_image,
+                1,
+                self._MAX_DEPTH_WIDTH * self._MAX_DEPTH_HEIGHT * 4,
+                isAsync,
+            )
+            return self.__decode_depth_image(raw_bytes)
+
+    def __decode_depth_image(
+        self, raw_bytes: memoryview
+    ) -> NDArray[(Any, Any), np.float32]:
         depth_image = np.frombuffer(raw_bytes, dtype=np.float32)
 
         # Calculate received height and width
@@ -71,9 +279,12 @@ class CameraSim(Camera):
         depth_width: int = 20 * 1 << n
         depth_height: int = 15 * 1 << n
 
-        # Reshape and resize to full resolution
-        depth_image = np.reshape(depth_image, (depth_height, depth_width), "C")
-        depth_image = cv.resize(
+        # Copy the image out of the reusable receive buffer at its native resolution
+        return np.reshape(depth_image, (depth_height, depth_width), "C").copy()
+
+    def __upsample_depth_image(
+        self, depth_image: NDArray[(Any, Any), np.float32]
+    ) -> NDArray[(480, 640), np.float32]:
+        return cv.resize(
             depth_image, (self._WIDTH, self._HEIGHT), interpolation=cv.INTER_AREA
         )
-        return depth_image
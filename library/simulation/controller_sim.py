@@ -1,96 +1,105 @@
-import sys
 import struct
 from enum import IntEnum
-from typing import Tuple, Dict
+from typing import Any, Dict, Tuple
 
 from controller import Controller
 
 
 class ControllerSim(Controller):
+    # The packed controller state sent by RacecarSim: bitmasks of the buttons which are
+    # down, were pressed, and were released, followed by the left and right trigger
+    # and the (x, y) of the left and right joystick
+    _SNAPSHOT_FORMAT: str = "BBBffffff"
+
     def __init__(self, racecar) -> None:
         self.__racecar = racecar
-        self.__is_down_cache: Dict[Controller.Button, bool] = {}
-        self.__was_pressed_cache: Dict[Controller.Button, bool] = {}
-        self.__was_released_cache: Dict[Controller.Button, bool] = {}
-        self.__get_trigger_cache: Dict[Controller.Trigger, float] = {}
-        self.__get_joystick_cache: Dict[Controller.Joystick, Tuple[float, float]] = {}
 
     def is_down(self, button: Controller.Button) -> bool:
-        if button.value not in self.__is_down_cache:
-            self.__racecar._RacecarSim__send_data(
-                struct.pack(
-                    "BB", self.__racecar.Header.controller_is_down.value, button.value
-                )
-            )
-            self.__is_down_cache[button.value] = bool(
-                int.from_bytes(
-                    self.__racecar._RacecarSim__receive_data(), sys.byteorder
-                )
-            )
-        return self.__is_down_cache[button.value]
+        return self.__get(self.__racecar.Header.controller_is_down, button)
 
     def was_pressed(self, button: Controller.Button) -> bool:
-        if button.value not in self.__was_pressed_cache:
-            self.__racecar._RacecarSim__send_data(
-                struct.pack(
-                    "BB",
-                    self.__racecar.Header.controller_was_pressed.value,
-                    button.value,
-                )
-            )
-            self.__was_pressed_cache[button.value] = bool(
-                int.from_bytes(
-                    self.__racecar._RacecarSim__receive_data(), sys.byteorder
-                )
-            )
-        return self.__was_pressed_cache[button.value]
+        return self.__get(self.__racecar.Header.controller_was_pressed, button)
 
     def was_released(self, button: Controller.Button) -> bool:
-        if button.value not in self.__was_released_cache:
-            self.__racecar._RacecarSim__send_data(
-                struct.pack(
-                    "BB",
-                    self.__racecar.Header.controller_was_released.value,
-                    button.value,
-                )
-            )
-            self.__was_released_cache[button.value] = bool(
-                int.from_bytes(
-                    self.__racecar._RacecarSim__receive_data(), sys.byteorder
-                )
-            )
-        return self.__was_released_cache[button.value]
+        return self.__get(self.__racecar.Header.controller_was_released, button)
 
     def get_trigger(self, trigger: Controller.Trigger) -> float:
-        if trigger.value not in self.__get_trigger_cache:
-            self.__racecar._RacecarSim__send_data(
-                struct.pack(
-                    "BB",
-                    self.__racecar.Header.controller_get_trigger.value,
-                    trigger.value,
-                )
-            )
-            [value] = struct.unpack("f", self.__racecar._RacecarSim__receive_data())
-            self.__get_trigger_cache[trigger.value] = value
-        return self.__get_trigger_cache[trigger.value]
+        return self.__get(self.__racecar.Header.controller_get_trigger, trigger)
 
     def get_joystick(self, joystick: Controller.Joystick) -> Tuple[float, float]:
-        if joystick.value not in self.__get_joystick_cache:
-            self.__racecar._RacecarSim__send_data(
-                struct.pack(
-                    "BB",
-                    self.__racecar.Header.controller_get_joystick.value,
-                    joystick.value,
+        return self.__get(self.__racecar.Header.controller_get_joystick, joystick)
+
+    def __get(self, header, key: IntEnum) -> Any:
+        # A press or release must not be reported again in a later frame
+        is_event = header in (
+            self.__racecar.Header.controller_was_pressed,
+            self.__racecar.Header.controller_was_released,
+        )
+        return self.__racecar._RacecarSim__cache.get(
+            (header, key.value), lambda: self.__request(header, key), is_event
+        )
+
+    def __request(self, header, key: IntEnum) -> Any:
+        # If RacecarSim supports it, fetch the state of every button, trigger, and
+        # joystick in a single exchange so the rest of the frame is served from cache
+        if (
+            self.__racecar._RacecarSim__features
+            & self.__racecar.Feature.controller_snapshot
+        ):
+            size = struct.calcsize(self._SNAPSHOT_FORMAT)
+            with self.__racecar._RacecarSim__exchange():
+                self.__racecar._RacecarSim__send_header(
+                    self.__racecar.Header.controller_get_snapshot
                 )
+                # If an earlier reply was lost, a message which arrives late may take
+                # the place of the snapshot, which is told apart by its size
+                raw_bytes = self.__racecar._RacecarSim__receive_data(size + 1)
+                if len(raw_bytes) != size:
+                    raise ConnectionError(
+                        f"Received {len(raw_bytes)} bytes from RacecarSim instead of "
+                        f"{size}."
+                    )
+            return self.__load_snapshot(raw_bytes)[(header, key.value)]
+
+        if header == self.__racecar.Header.controller_get_trigger:
+            format = "f"
+        elif header == self.__racecar.Header.controller_get_joystick:
+            format = "ff"
+        else:
+            format = "?"
+        with self.__racecar._RacecarSim__exchange():
+            self.__racecar._RacecarSim__send_data(
+                struct.pack("BB", header.value, key.value)
+            )
+            values = self.__racecar._RacecarSim__receive_values(format)
+        return values if len(values) > 1 else values[0]
+
+    def __load_snapshot(self, raw_bytes: memoryview) -> Dict[Tuple[int, int], Any]:
+        Header = self.__racecar.Header
+        values = struct.unpack(self._SNAPSHOT_FORMAT, raw_bytes)
+        (is_down, was_pressed, was_released) = values[0:3]
+
+        snapshot: Dict[Tuple[int, int], Any] = {}
+        for button in Controller.Button:
+            snapshot[(Header.controller_is_down, button.value)] = bool(
+                is_down >> button.value & 1
+            )
+            snapshot[(Header.controller_was_pressed, button.value)] = bool(
+                was_pressed >> button.value & 1
             )
-            self.__get_joystick_cache[joystick.value] = struct.unpack(
-                "ff", self.__racecar._RacecarSim__receive_data(8)
+            snapshot[(Header.controller_was_released, button.value)] = bool(
+                was_released >> button.value & 1
             )
-        return self.__get_joystick_cache[joystick.value]
+        for trigger in Controller.Trigger:
+            snapshot[(Header.controller_get_trigger, trigger.value)] = values[
+                3 + trigger.value
+            ]
+        for joystick in Controller.Joystick:
+            index = 5 + 2 * joystick.value
+            snapshot[(Header.controller_get_joystick, joystick.value)] = values[
+                index : index + 2
+            ]
 
-    def __update(self) -> None:
-        self.__is_down_cache.clear()
-        self.__was_pressed_cache.clear()
-        self.__was_released_cache.clear()
-        self.__get_trigger_cache.clear()
-        self.__get_joystick_cache.clear()
+        for (key, value) in snapshot.items():
+            self.__racecar._RacecarSim__cache.set(key, value)
+        return snapshot
@@ -4,34 +4,38 @@ import numpy as np
 from nptyping import NDArray
 
 from lidar import Lidar
+from shared_memory_sim import SharedMemorySim
 
 
 class LidarSim(Lidar):
     def __init__(self, racecar) -> None:
         self.__racecar = racecar
-        self.__ranges: NDArray[720, np.float32]
-        self.__is_current: bool = False
 
     def get_samples(self) -> NDArray[720, np.float32]:
-        if not self.__is_current:
+        return self.__racecar._RacecarSim__cache.get(
+            self.__racecar.Header.lidar_get_samples,
+            lambda: self.__request_samples(False),
+        )
+
+    def get_samples_async(self) -> NDArray[720, np.float32]:
+        return self.__request_samples(True)
+
+    def __request_samples(self, is_async: bool) -> NDArray[720, np.float32]:
+        with self.__racecar._RacecarSim__exchange():
             self.__racecar._RacecarSim__send_header(
-                self.__racecar.Header.lidar_get_samples
+                self.__racecar.Header.lidar_get_samples, is_async
             )
-            raw_bytes: bytes = self.__racecar._RacecarSim__receive_data(
-                self._NUM_SAMPLES * 4
+            raw_bytes = self.__racecar._RacecarSim__receive_block(
+                SharedMemorySim.Stream.lidar, 1, self._NUM_SAMPLES * 4, is_async
             )
-            self.__ranges = np.frombuffer(raw_bytes, dtype=np.float32)
-            self.__is_current = True
-        return self.__ranges
 
-    def get_samples_async(self) -> NDArray[720, np.float32]:
-        self.__racecar._RacecarSim__send_header(
-            self.__racecar.Header.lidar_get_samples, True
-        )
-        raw_bytes: bytes = self.__racecar._RacecarSim__receive_data(
-            self._NUM_SAMPLES * 4
-        )
-        return np.frombuffer(raw_bytes, dtype=np.float32)
+            # Copy the samples out of the reusable receive buffer (or shared memory) so
+            # that scans kept from previous frames are not overwritten
+            return np.frombuffer(raw_bytes, dtype=np.float32).copy()
 
-    def __update(self) -> None:
-        self.__is_current = False
+    def __load_samples(self, raw_bytes: memoryview) -> None:
+        # Copy the samples since the bundle buffer is reused by the next frame
+        self.__racecar._RacecarSim__cache.set(
+            self.__racecar.Header.lidar_get_samples,
+            np.frombuffer(raw_bytes, dtype=np.float32).copy(),
+        )
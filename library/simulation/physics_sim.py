@@ -5,20 +5,37 @@ from nptyping import NDArray
 
 from physics import Physics
 
+
 class PhysicsSim(Physics):
     def __init__(self, racecar) -> None:
         self.__racecar = racecar
 
     def get_linear_acceleration(self) -> NDArray[3, np.float32]:
-        self.__racecar._RacecarSim__send_header(
-            self.__racecar.Header.physics_get_linear_acceleration
-        )
-        values = struct.unpack("fff", self.__racecar._RacecarSim__receive_data(12))
-        return np.array(values)
+        return self.__get(self.__racecar.Header.physics_get_linear_acceleration)
 
     def get_angular_velocity(self) -> NDArray[3, np.float32]:
-        self.__racecar._RacecarSim__send_header(
-            self.__racecar.Header.physics_get_angular_velocity
+        return self.__get(self.__racecar.Header.physics_get_angular_velocity)
+
+    def __get(self, header) -> NDArray[3, np.float32]:
+        # Copy the cached values so that changes by the caller do not affect later reads
+        return np.array(
+            self.__racecar._RacecarSim__cache.get(
+                header, lambda: self.__request(header)
+            )
+        )
+
+    def __request(self, header) -> NDArray[3, np.float32]:
+        with self.__racecar._RacecarSim__exchange():
+            self.__racecar._RacecarSim__send_header(header)
+            values = self.__racecar._RacecarSim__receive_values("fff")
+            return np.array(values)
+
+    def __load_values(self, raw_bytes: memoryview) -> None:
+        values = struct.unpack("ffffff", raw_bytes)
+        self.__racecar._RacecarSim__cache.set(
+            self.__racecar.Header.physics_get_linear_acceleration,
+            np.array(values[0:3]),
+        )
+        self.__racecar._RacecarSim__cache.set(
+            self.__racecar.Header.physics_get_angular_velocity, np.array(values[3:6])
         )
-        values = struct.unpack("fff", self.__racecar._RacecarSim__receive_data(12))
-        return np.array(values)
@@ -6,13 +6,17 @@ Summer 2020
 Manages communication with RacecarSim.
 """
 
+import collections
 import struct
 import socket
 import sys
 import select
-from enum import IntEnum
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from enum import IntEnum, IntFlag
 from signal import signal, SIGINT
-from typing import Callable, Optional
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
 
 import camera_sim
 import controller_sim
@@ -20,7 +24,10 @@ import display_sim
 import drive_sim
 import lidar_sim
 import physics_sim
+from sensor_cache_sim import SensorCacheSim
+from shared_memory_sim import SharedMemorySim
 
+from profiling import FrameProfiler, Histogram
 from racecar_core import Racecar
 import racecar_utils as rc_utils
 
@@ -31,6 +38,40 @@ class RacecarSim(Racecar):
     __UNITY_ASYNC_PORT = (__IP, 5064)
     __VERSION = 1
 
+    # The range of seconds to wait for the reply to a request before considering it
+    # lost, within which the timeout adapts to the reply times seen so far for the
+    # same request, and the timeout used before any reply to it has arrived
+    __MIN_REPLY_TIMEOUT = 0.005
+    __MAX_REPLY_TIMEOUT = 2.0
+    __INITIAL_REPLY_TIMEOUT = 1.0
+
+    # The shortest timeout without sequence ids, where a reply which arrives after we
+    # have given up on it would be mistaken for the reply to the next request
+    __MIN_UNTAGGED_REPLY_TIMEOUT = 0.1
+
+    # The longest timeout for the rest of a reply once part of it has arrived, which
+    # is well within the second RacecarSim waits for us in the middle of a block
+    # message before abandoning it
+    __MAX_BLOCK_REPLY_TIMEOUT = 0.5
+
+    # Seconds to wait for the next fragment of a streamed transfer before asking
+    # RacecarSim to resend the fragments which are still missing
+    __FRAGMENT_TIMEOUT = 0.1
+
+    # The number of times in a row the missing fragments of a streamed transfer are
+    # requested without any of them arriving before the transfer is given up
+    __MAX_FRAGMENT_REQUESTS = 3
+
+    # The largest fragment RacecarSim sends for a block message of a given size
+    __MAX_FRAGMENT_SIZE = 640 * 480 * 4 // 32
+
+    # The largest message which can be received over UDP
+    __MAX_DATAGRAM_SIZE = 65536
+
+    # The socket receive buffer size we request, which bounds how many bytes of a
+    # streamed transfer RacecarSim may send before Python acknowledges them
+    __RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+
     class Header(IntEnum):
         """
         The packet headers of the communication protocol with RacecarSim.
@@ -65,6 +106,12 @@ class RacecarSim(Racecar):
         lidar_get_samples = 26
         physics_get_linear_acceleration = 27
         physics_get_angular_velocity = 28
+        python_fragment_ack = 29
+        python_fragments_missing = 30
+        racecar_get_frame_bundle = 31
+        controller_get_snapshot = 32
+        camera_get_color_image_region = 33
+        camera_get_color_image_format = 34
 
     class Error(IntEnum):
         """
@@ -79,31 +126,549 @@ class RacecarSim(Racecar):
         racecarsim_outdated = 5
         fragment_mismatch = 6
 
+    class Feature(IntFlag):
+        """
+        Optional extensions of the communication protocol, negotiated with RacecarSim
+        during the connect handshake.
+        """
+
+        # RacecarSim streams the fragments of a block message, each prefixed with its
+        # index, within the receive window announced by Python.  Python acknowledges
+        # progress without blocking and requests any missing fragments at the end.
+        fragment_stream = 1
+
+        # RacecarSim replies to racecar_get_frame_bundle with the delta time and the
+        # requested sensors in a single block message
+        frame_bundle = 2
+
+        # RacecarSim replies to controller_get_snapshot with the packed state of the
+        # entire controller
+        controller_snapshot = 4
+
+        # RacecarSim attaches to the shared memory block named in the handshake and
+        # writes block messages there, replying over UDP with only a sequence number
+        shared_memory = 8
+
+        # RacecarSim replies to camera_get_color_image_region with only the requested
+        # rectangle of the color image, optionally downscaled
+        color_region = 16
+
+        # RacecarSim replies to camera_get_color_image_format with a rectangle of the
+        # color image converted to the requested Camera.PixelFormat, and sends the
+        # color image of a frame bundle as BGR
+        pixel_format = 32
+
+        # Every message in either direction begins with the sequence id of the request
+        # it belongs to, or 0 for commands from RacecarSim, so that several threads can
+        # make requests at the same time
+        sequence_ids = 64
+
+    # The protocol extensions supported by this version of racecar_core
+    __FEATURES = (
+        Feature.fragment_stream
+        | Feature.frame_bundle
+        | Feature.controller_snapshot
+        | Feature.shared_memory
+        | Feature.color_region
+        | Feature.pixel_format
+        | Feature.sequence_ids
+    )
+
+    class Sensor(IntFlag):
+        """
+        The sensors which can be included in a frame bundle.
+        """
+
+        controller = 1
+        physics = 2
+        lidar = 4
+        depth_image = 8
+        color_image = 16
+
     def __send_header(self, function_code: Header, is_async: bool = False) -> None:
         self.__send_data(struct.pack("B", function_code.value), is_async)
 
     def __send_error(self, error: Error, is_async: bool = False) -> None:
         self.__send_data(struct.pack("BB", self.Header.error, error), is_async)
 
+    class __ExchangeStats:
+        """
+        The first request of an exchange, when it was sent, and the number of bytes
+        received in reply so far.
+        """
+
+        def __init__(self) -> None:
+            self.header: Optional[int] = None
+            self.send_time: float = 0
+            self.num_bytes: int = 0
+
+    class __ReplyEstimate:
+        """
+        The smoothed time RacecarSim takes to reply to one kind of request, its mean
+        deviation, and the number of replies in a row which were lost since then.
+        """
+
+        def __init__(self) -> None:
+            self.reply_time: Optional[float] = None
+            self.deviation: float = 0
+            self.num_lost: int = 0
+
+    @contextmanager
+    def __exchange(self) -> Iterator[None]:
+        """
+        Marks a request and every message of its reply as one exchange, which is safe
+        to make while other threads make their own exchanges.
+        """
+        previous = getattr(self.__thread_state, "exchange", None)
+        exchange = self.__ExchangeStats()
+        self.__thread_state.exchange = exchange
+        try:
+            with self.__take_turn():
+                yield
+        finally:
+            self.__thread_state.exchange = previous
+
+        # Only exchanges which received their entire reply are recorded
+        if exchange.header is not None:
+            self.__record_exchange(
+                exchange.header,
+                time.perf_counter() - exchange.send_time,
+                exchange.num_bytes,
+            )
+
+    @contextmanager
+    def __take_turn(self) -> Iterator[None]:
+        if not self.__features & self.Feature.sequence_ids:
+            with self.__get_exchange_lock():
+                try:
+                    yield
+                except (TimeoutError, ConnectionError):
+                    # Without sequence ids, what arrived of a lost reply would be
+                    # mistaken for the reply to the next request
+                    self.__discard_received()
+                    raise
+            return
+
+        # With sequence ids, the exchange is tagged so that its replies can be told
+        # apart from those of other threads.  Shared memory only holds the two most
+        # recent messages of each stream though, so exchanges still take turns when
+        # it is in use.
+        with (
+            self.__get_exchange_lock()
+            if self.__features & self.Feature.shared_memory
+            else nullcontext()
+        ):
+            previous = getattr(self.__thread_state, "sequence", None)
+            sequence = self.__open_mailbox()
+            self.__thread_state.sequence = sequence
+            try:
+                yield
+            finally:
+                self.__thread_state.sequence = previous
+                self.__close_mailbox(sequence)
+
     def __send_data(self, data: bytes, is_async: bool = False) -> None:
+        exchange = getattr(self.__thread_state, "exchange", None)
+        if exchange is not None and exchange.header is None:
+            exchange.header = data[0]
+            exchange.send_time = time.perf_counter()
+
+        if self.__features & self.Feature.sequence_ids:
+            # A message sent outside of an exchange expects no reply, so it is given
+            # a sequence id of its own
+            sequence = getattr(self.__thread_state, "sequence", None)
+            if sequence is None:
+                sequence = self.__open_mailbox()
+                self.__close_mailbox(sequence)
+            self.__socket_send(struct.pack("H", sequence) + data, is_async)
+        else:
+            with self.__get_exchange_lock():
+                self.__socket_send(data, is_async)
+
+    def __receive_data(self, buffer_size: int = 8) -> bytes:
+        self.__await_reply()
+        if self.__features & self.Feature.sequence_ids:
+            data = self.__receive_tagged(self.__get_sequence())[:buffer_size]
+        else:
+            data = self.__socket_receive(buffer_size)
+        self.__count_received(len(data))
+        self.__check_error(data, len(data), buffer_size)
+        return data
+
+    def __receive_values(self, format: str) -> Tuple[Any, ...]:
+        # If an earlier message of the reply was lost, the next one may have arrived in
+        # its place, which is told apart by its size
+        size = struct.calcsize(format)
+        data = self.__receive_data(size + 1)
+        if len(data) != size:
+            raise ConnectionError(
+                f"Received {len(data)} bytes from RacecarSim instead of {size}."
+            )
+        return struct.unpack(format, data)
+
+    def __receive_into(self, buffer: memoryview) -> int:
+        self.__await_reply()
+        if self.__features & self.Feature.sequence_ids:
+            data = self.__receive_tagged(self.__get_sequence())
+            num_bytes = min(len(data), len(buffer))
+            buffer[:num_bytes] = data[:num_bytes]
+        else:
+            num_bytes = self.__socket_receive_into(buffer)
+        self.__count_received(num_bytes)
+        self.__check_error(buffer, num_bytes, len(buffer))
+        return num_bytes
+
+    def __wait_for_data(self, timeout: float) -> bool:
+        if self.__features & self.Feature.sequence_ids:
+            return self.__wait_tagged(self.__get_sequence(), timeout)
+        return self.__socket_wait(timeout)
+
+    def __await_reply(self) -> None:
+        exchange = getattr(self.__thread_state, "exchange", None)
+        header = None if exchange is None else exchange.header
+        timeout = self.__get_reply_timeout(header)
+        if exchange is not None and exchange.num_bytes > 0:
+            timeout = min(timeout, self.__MAX_BLOCK_REPLY_TIMEOUT)
+        if not self.__wait_for_data(timeout):
+            # Wait twice as long for the next reply to the same request, as TCP backs
+            # off after a loss, in case RacecarSim is only slower than expected
+            with self.__stats_lock:
+                self.__get_reply_estimate(header).num_lost += 1
+            raise TimeoutError("The reply from RacecarSim was lost.")
+
+        with self.__stats_lock:
+            estimate = self.__get_reply_estimate(header)
+            estimate.num_lost = 0
+
+            # Time the first reply of each exchange, and keep a smoothed reply time
+            # and its deviation for each request, as TCP does for round trips
+            if exchange is None or header is None or exchange.num_bytes > 0:
+                return
+            reply_time = time.perf_counter() - exchange.send_time
+            if estimate.reply_time is None:
+                estimate.reply_time = reply_time
+                estimate.deviation = reply_time / 2
+            else:
+                estimate.deviation += (
+                    abs(reply_time - estimate.reply_time) - estimate.deviation
+                ) / 4
+                estimate.reply_time += (reply_time - estimate.reply_time) / 8
+
+    def __count_received(self, num_bytes: int) -> None:
+        exchange = getattr(self.__thread_state, "exchange", None)
+        if exchange is not None:
+            exchange.num_bytes += num_bytes
+
+    def __record_exchange(self, header: int, seconds: float, num_bytes: int) -> None:
+        with self.__stats_lock:
+            if header not in self.__round_trip_times:
+                self.__round_trip_times[header] = Histogram(1e-5, 10)
+                self.__reply_sizes[header] = Histogram(1, 2 ** 26, 1)
+            self.__round_trip_times[header].add(seconds)
+            self.__reply_sizes[header].add(num_bytes)
+
+    def __get_reply_estimate(self, header: Optional[int]) -> __ReplyEstimate:
+        if header not in self.__reply_estimates:
+            self.__reply_estimates[header] = self.__ReplyEstimate()
+        return self.__reply_estimates[header]
+
+    def __get_reply_timeout(self, header: Optional[int]) -> float:
+        with self.__stats_lock:
+            estimate = self.__get_reply_estimate(header)
+            if estimate.reply_time is None:
+                timeout = self.__INITIAL_REPLY_TIMEOUT
+            else:
+                timeout = max(
+                    estimate.reply_time + 4 * estimate.deviation,
+                    self.__MIN_REPLY_TIMEOUT
+                    if self.__features & self.Feature.sequence_ids
+                    else self.__MIN_UNTAGGED_REPLY_TIMEOUT,
+                )
+            num_lost = min(estimate.num_lost, 16)
+        return min(timeout * 2 ** num_lost, self.__MAX_REPLY_TIMEOUT)
+
+    def __check_error(self, data: memoryview, num_bytes: int, expected: int) -> None:
+        # RacecarSim replies with an error instead if it receives a request in the
+        # middle of a block message, which abandons the block
+        if (
+            num_bytes == struct.calcsize("BB")
+            and num_bytes < expected
+            and data[0] == self.Header.error.value
+        ):
+            raise ConnectionError(f"RacecarSim replied with error [{data[1]}].")
+
+    def __discard_received(self) -> None:
+        while self.__socket_wait(0):
+            self.__socket_receive(self.__MAX_DATAGRAM_SIZE)
+
+    def __receive_command(self) -> bytes:
+        # Commands from RacecarSim are not part of any exchange, so without sequence
+        # ids, other threads must not make exchanges while we wait for one
+        if self.__features & self.Feature.sequence_ids:
+            return self.__receive_tagged(0)
+        with self.__get_exchange_lock():
+            data = self.__socket_receive(8)
+            if self.__is_between_frames:
+                self.__is_between_frames = False
+                self.__get_exchange_lock().release()
+            return data
+
+    def __get_sequence(self) -> int:
+        # Messages received outside of an exchange are commands, with sequence id 0
+        sequence = getattr(self.__thread_state, "sequence", None)
+        return 0 if sequence is None else sequence
+
+    def __get_exchange_lock(self) -> threading.RLock:
+        return self.__exchange_lock
+
+    ####################################################################################
+    # Demultiplexing replies by sequence id
+    ####################################################################################
+
+    def __open_mailbox(self) -> int:
+        with self.__mailbox_condition:
+            while True:
+                self.__last_sequence = self.__last_sequence % 0xFFFF + 1
+                if self.__last_sequence not in self.__mailboxes:
+                    self.__mailboxes[self.__last_sequence] = collections.deque()
+                    return self.__last_sequence
+
+    def __close_mailbox(self, sequence: int) -> None:
+        with self.__mailbox_condition:
+            del self.__mailboxes[sequence]
+
+    def __receive_tagged(self, sequence: int) -> bytes:
+        self.__wait_tagged(sequence, None)
+        with self.__mailbox_condition:
+            return self.__mailboxes[sequence].popleft()
+
+    def __wait_tagged(self, sequence: int, timeout: Optional[float]) -> bool:
+        """
+        Waits until a message with the given sequence id has been received.
+
+        Whichever waiting thread finds the socket unattended reads from it, and places
+        each message in the mailbox of its sequence id for the thread which owns it.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            with self.__mailbox_condition:
+                while True:
+                    if len(self.__mailboxes[sequence]) > 0:
+                        return True
+                    remaining = (
+                        None
+                        if deadline is None
+                        else max(0, deadline - time.perf_counter())
+                    )
+                    if not self.__is_reading:
+                        self.__is_reading = True
+                        break
+                    if remaining == 0:
+                        return False
+                    self.__mailbox_condition.wait(remaining)
+
+            data = None
+            try:
+                if self.__socket_wait(remaining):
+                    data = self.__socket_receive(self.__MAX_DATAGRAM_SIZE)
+            finally:
+                with self.__mailbox_condition:
+                    self.__is_reading = False
+                    if data is not None and len(data) >= struct.calcsize("H"):
+                        # Late messages of a finished exchange are dropped
+                        [tag] = struct.unpack_from("H", data)
+                        mailbox = self.__mailboxes.get(tag)
+                        if mailbox is not None:
+                            mailbox.append(data[struct.calcsize("H") :])
+                    self.__mailbox_condition.notify_all()
+
+            # The socket was polled until the deadline without receiving anything more
+            if data is None:
+                with self.__mailbox_condition:
+                    return len(self.__mailboxes[sequence]) > 0
+
+    ####################################################################################
+    # Socket access, which may be replaced to receive messages by other means
+    ####################################################################################
+
+    def __socket_send(self, data: bytes, is_async: bool) -> None:
         if is_async:
             self.__socket.sendto(data, self.__UNITY_ASYNC_PORT)
         else:
             self.__socket.sendto(data, self.__UNITY_PORT)
 
-    def __receive_data(self, buffer_size: int = 8) -> bytes:
+    def __socket_receive(self, buffer_size: int) -> bytes:
         data, _ = self.__socket.recvfrom(buffer_size)
         return data
 
+    def __socket_receive_into(self, buffer: memoryview) -> int:
+        num_bytes, _ = self.__socket.recvfrom_into(buffer, len(buffer))
+        return num_bytes
+
+    def __socket_wait(self, timeout: Optional[float]) -> bool:
+        ready = select.select([self.__socket], [], [], timeout)
+        return len(ready[0]) > 0
+
+    def __receive_block(
+        self,
+        stream: SharedMemorySim.Stream,
+        num_fragments: int,
+        total_bytes: int,
+        is_async: bool = False,
+    ) -> memoryview:
+        # With shared memory, RacecarSim only tells us which slot holds the data
+        if self.__features & self.Feature.shared_memory:
+            [sequence] = self.__receive_values("I")
+            block = self.__shared_memory.read(stream, sequence)
+            self.__count_received(len(block))
+            return block
+
+        return self.__receive_fragmented(num_fragments, total_bytes, is_async)
+
     def __receive_fragmented(
         self, num_fragments: int, total_bytes: int, is_async: bool = False
-    ) -> bytes:
-        raw_bytes: bytes = bytes()
+    ) -> memoryview:
+        # A block message of a single fragment is sent as a plain datagram of at most
+        # total_bytes, without acknowledgement
+        if num_fragments == 1:
+            buffer = self.__get_receive_buffer(total_bytes, is_async)
+            num_bytes = self.__receive_into(buffer[:total_bytes])
+            return buffer[:num_bytes]
+
+        if self.__features & self.Feature.fragment_stream:
+            return self.__receive_fragment_stream(num_fragments, total_bytes, is_async)
+
+        # Receive each fragment in place into the preallocated buffer of this stream,
+        # so a full frame costs no intermediate allocations or copies
+        buffer = self.__get_receive_buffer(total_bytes, is_async)
         fragment_size = total_bytes // num_fragments
+        num_lost = 0
+        num_lost_in_a_row = 0
         for i in range(0, num_fragments):
-            raw_bytes += self.__receive_data(fragment_size)
+            offset = i * fragment_size
+            try:
+                self.__receive_into(buffer[offset : offset + fragment_size])
+                num_lost_in_a_row = 0
+            except TimeoutError:
+                # A lost fragment cannot be requested again, but the rest are still
+                # asked for so that RacecarSim finishes the block in step with us
+                num_lost += 1
+                num_lost_in_a_row += 1
+                if num_lost_in_a_row >= self.__MAX_FRAGMENT_REQUESTS:
+                    raise
             self.__send_header(self.Header.python_send_next, is_async)
-        return raw_bytes
+
+        if num_lost > 0:
+            raise TimeoutError(f"{num_lost} fragments of a block message were lost.")
+        return buffer[:total_bytes]
+
+    def __receive_fragment_stream(
+        self, num_fragments: int, total_bytes: int, is_async: bool
+    ) -> memoryview:
+        buffer = self.__get_receive_buffer(total_bytes, is_async)
+        fragment_size = total_bytes // num_fragments
+        index_size = struct.calcsize("H")
+
+        # Each datagram holds the fragment index followed by the fragment itself
+        fragment = self.__get_receive_buffer(
+            index_size + fragment_size, is_async, "fragment"
+        )[: index_size + fragment_size]
+
+        # RacecarSim keeps at most a receive window of fragments in flight, so we
+        # acknowledge our progress (without waiting for a reply) every half window
+        window = max(1, self.__receive_window // fragment_size)
+        ack_interval = max(1, window // 2)
+        num_acknowledged = 0
+        num_contiguous = 0
+
+        # Collect fragments in whatever order they arrive until every fragment has been
+        # received or the round ends, then finish the block by reporting the missing
+        # fragments (if any), which RacecarSim will send again.  RacecarSim sends the
+        # fragments of a round in order, so a round ends as soon as its last fragment
+        # arrives, or otherwise once the stream goes quiet.
+        missing = set(range(num_fragments))
+        last_index = num_fragments - 1
+        num_quiet_rounds = 0
+
+        # RacecarSim may take as long to start the stream as to reply to the request,
+        # so only the gaps between fragments are bounded by the fragment timeout
+        exchange = getattr(self.__thread_state, "exchange", None)
+        header = None if exchange is None else exchange.header
+        timeout = self.__get_reply_timeout(header)
+        while True:
+            num_missing = len(missing)
+            while len(missing) > 0:
+                if not self.__wait_for_data(timeout):
+                    break
+                timeout = self.__FRAGMENT_TIMEOUT
+                num_bytes = self.__receive_into(fragment)
+                [index] = struct.unpack_from("H", fragment)
+                if index in missing and num_bytes == len(fragment):
+                    offset = index * fragment_size
+                    buffer[offset : offset + fragment_size] = fragment[index_size:]
+                    missing.remove(index)
+
+                while num_contiguous < num_fragments and num_contiguous not in missing:
+                    num_contiguous += 1
+                if num_contiguous - num_acknowledged >= ack_interval:
+                    num_acknowledged = num_contiguous
+                    self.__send_data(
+                        struct.pack(
+                            "BB", self.Header.python_fragment_ack, num_acknowledged
+                        ),
+                        is_async,
+                    )
+                if index == last_index:
+                    break
+
+            if len(missing) < num_missing:
+                num_quiet_rounds = 0
+            else:
+                num_quiet_rounds += 1
+            if num_quiet_rounds >= self.__MAX_FRAGMENT_REQUESTS:
+                # Tell RacecarSim to stop resending the block before giving up on it
+                self.__send_data(
+                    struct.pack("BB", self.Header.python_fragments_missing, 0),
+                    is_async,
+                )
+                raise TimeoutError("The fragments of a block message were lost.")
+
+            self.__send_data(
+                struct.pack(
+                    f"BB{len(missing)}B",
+                    self.Header.python_fragments_missing,
+                    len(missing),
+                    *sorted(missing),
+                ),
+                is_async,
+            )
+            if len(missing) == 0:
+                return buffer[:total_bytes]
+            last_index = max(missing)
+
+    def __get_fragment_layout(self, num_bytes: int) -> Tuple[int, int]:
+        # Block messages whose size is not fixed by the protocol are split into the
+        # fewest fragments of at most __MAX_FRAGMENT_SIZE bytes, all of equal size, with
+        # the final fragment padded
+        num_fragments = max(1, -(-num_bytes // self.__MAX_FRAGMENT_SIZE))
+        return (num_fragments, -(-num_bytes // num_fragments))
+
+    def __get_receive_buffer(
+        self, num_bytes: int, is_async: bool, purpose: str = "block"
+    ) -> memoryview:
+        # Each thread owns a buffer for the sync and async streams, which is only
+        # reallocated if a larger transfer is requested.  The contents are overwritten
+        # by the next transfer on the same stream, so callers must finish with (or
+        # copy) the data before making another request.
+        if not hasattr(self.__thread_state, "buffers"):
+            self.__thread_state.buffers = {}
+        buffers: Dict[Tuple[str, bool], memoryview] = self.__thread_state.buffers
+
+        buffer = buffers.get((purpose, is_async))
+        if buffer is None or len(buffer) < num_bytes:
+            buffer = memoryview(bytearray(num_bytes))
+            buffers[(purpose, is_async)] = buffer
+        return buffer
 
     def __init__(self, isHeadless: bool = False) -> None:
         self.camera = camera_sim.CameraSim(self)
@@ -112,38 +677,115 @@ class RacecarSim(Racecar):
         self.drive = drive_sim.DriveSim(self)
         self.physics = physics_sim.PhysicsSim(self)
         self.lidar = lidar_sim.LidarSim(self)
+        self.profiler = FrameProfiler()
 
         self.__start: Callable[[], None]
         self.__update: Callable[[], None]
         self.__update_slow: Optional[Callable[[], None]]
         self.__update_slow_time: float = 1
         self.__update_slow_counter: float = 0
-        self.__delta_time: float = -1
+        self.__cache = SensorCacheSim()
 
         self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        # Exchanges made by other threads are kept apart by sequence ids if RacecarSim
+        # supports them, and are otherwise made one at a time
+        self.__thread_state = threading.local()
+        self.__exchange_lock = threading.RLock()
+        self.__mailbox_condition = threading.Condition()
+        self.__mailboxes: Dict[int, Deque[bytes]] = {0: collections.deque()}
+        self.__last_sequence: int = 0
+        self.__is_reading: bool = False
+        self.__is_between_frames: bool = False
+
+        # The round trip time and reply size of the exchanges made for each header, and
+        # the estimate of how long to wait for the reply to each header
+        self.__stats_lock = threading.Lock()
+        self.__reply_estimates: Dict[Optional[int], RacecarSim.__ReplyEstimate] = {}
+        self.__round_trip_times: Dict[int, Histogram] = {}
+        self.__reply_sizes: Dict[int, Histogram] = {}
+
+        # The operating system may grant a smaller buffer than requested, and Linux
+        # reports double the usable size, so only announce half of the granted size
+        try:
+            self.__socket.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, self.__RECEIVE_BUFFER_SIZE
+            )
+        except OSError:
+            pass
+        self.__receive_window: int = (
+            self.__socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) // 2
+        )
+        self.__features: RacecarSim.Feature = self.Feature(0)
+        self.__shared_memory: Optional[SharedMemorySim] = None
+        self.__frame_bundle: RacecarSim.Sensor = self.Sensor(0)
         self.__in_call: bool = False
 
         signal(SIGINT, self.__handle_sigint)
 
     def go(self) -> None:
+        try:
+            if self.__connect():
+                # Respond to start/update commands from RacecarSim (sync) until we
+                # receive an exit or error command
+                while self.__handle_command(self.__receive_command()):
+                    pass
+        finally:
+            self.__disconnect()
+
+    def __connect(self) -> bool:
+        """
+        Performs the handshake with RacecarSim, and returns whether it succeeded.
+        """
+        # Offer a shared memory block for large data, which RacecarSim can only attach
+        # to if it supports shared memory and runs on the same machine
+        features = self.__FEATURES
+        shared_memory_name = bytes()
+        if SharedMemorySim.is_available():
+            self.__shared_memory = SharedMemorySim()
+            shared_memory_name = self.__shared_memory.get_name().encode()
+        else:
+            features &= ~self.Feature.shared_memory
+
         print(">> Python script loaded, awaiting connection from RacecarSim.")
 
-        # Repeatedly try to connect to RacecarSim (async) until we receive a response
+        # Repeatedly try to connect to RacecarSim (async) until we receive a response.
+        # The supported protocol extensions, our receive window, and the name of our
+        # shared memory block are appended to the version, and a RacecarSim which does
+        # not recognize them replies with only the car index.
         while True:
             self.__send_data(
-                struct.pack("BB", self.Header.connect, self.__VERSION), True
+                struct.pack(
+                    "BBII",
+                    self.Header.connect,
+                    self.__VERSION,
+                    features,
+                    self.__receive_window,
+                )
+                + shared_memory_name,
+                True,
             )
-            ready = select.select([self.__socket], [], [], 0.25)
-            if ready[0]:
-                data, _ = self.__socket.recvfrom(2)
+            if self.__wait_for_data(0.25):
+                # The reply is not part of an exchange, and may be an error
+                data = self.__receive_command()
                 header = int(data[0])
                 if header == self.Header.connect.value:
                     car_index = int(data[1])
+                    if len(data) >= struct.calcsize("BBI"):
+                        [_, _, accepted] = struct.unpack("BBI", data)
+                        self.__features = self.Feature(accepted & features)
+                    if (
+                        self.__shared_memory is not None
+                        and not self.__features & self.Feature.shared_memory
+                    ):
+                        self.__shared_memory.close()
+                        self.__shared_memory = None
                     rc_utils.print_colored(
                         f">> Connection established with RacecarSim (assigned to car number {car_index}). Enter user program mode in RacecarSim to begin...",
                         rc_utils.TerminalColor.green,
                     )
-                    break
+                    self.__hold_exchanges_until_command()
+                    return True
                 elif header == self.Header.error.value:
                     self.__handle_error(int(data[1]))
                 else:
@@ -151,51 +793,92 @@ class RacecarSim(Racecar):
                         ">> Invalid handshake with RacecarSim, closing script..."
                     )
                     self.__send_header(self.Header.error)
-                    return
+                    return False
 
-        # Respond to start/update commands from RacecarSim (sync) until we receive an
-        # exit or error command
-        while True:
-            data, _ = self.__socket.recvfrom(8)
-            header = int(data[0])
+    def __disconnect(self) -> None:
+        if self.__is_between_frames:
+            self.__is_between_frames = False
+            self.__get_exchange_lock().release()
+        if self.__shared_memory is not None:
+            self.__shared_memory.close()
+            self.__shared_memory = None
 
-            if header == self.Header.unity_start.value:
-                try:
-                    self.__in_call = True
-                    self.set_update_slow_time()
-                    self.__start()
-                    self.__in_call = False
-                except SystemExit:
-                    raise
-                except:
-                    self.__send_error(self.Error.python_exception)
-                    raise
-            elif header == self.Header.unity_update.value:
-                try:
-                    self.__in_call = True
-                    self.__handle_update()
-                    self.__in_call = False
-                except SystemExit:
-                    raise
-                except:
-                    self.__send_error(self.Error.python_exception)
-                    raise
-            elif header == self.Header.unity_exit.value:
+    def __poll_command(self) -> Optional[bytes]:
+        """
+        Returns the next command from RacecarSim if it has already arrived, or None.
+        """
+        if self.__features & self.Feature.sequence_ids:
+            if not self.__wait_tagged(0, 0):
+                return None
+        elif not self.__socket_wait(0):
+            return None
+        return self.__receive_command()
+
+    def __handle_command(self, data: bytes) -> bool:
+        """
+        Handles a command from RacecarSim, and returns whether more will follow.
+        """
+        header = int(data[0])
+
+        if header == self.Header.unity_start.value:
+            try:
+                self.__in_call = True
+                self.set_update_slow_time()
+                self.__start()
+                self.__cache.clear()
+                rc_utils.clear_frame_cache()
+                self.__in_call = False
+            except SystemExit:
+                raise
+            except:
+                self.__send_error(self.Error.python_exception)
+                raise
+        elif header == self.Header.unity_update.value:
+            try:
+                self.__in_call = True
+                self.__handle_update()
+                self.__in_call = False
+            except SystemExit:
+                raise
+            except:
+                self.__send_error(self.Error.python_exception)
+                raise
+        elif header == self.Header.unity_exit.value:
+            rc_utils.print_warning(
+                ">> Exit command received from RacecarSim, closing script..."
+            )
+            return False
+        elif header == self.Header.error:
+            error = int(data[1]) if len(data) > 1 else self.Error.generic
+            if error == self.Error.fragment_mismatch:
+                # A block message which we already gave up on is not a command, and is
+                # requested again if it is still needed
                 rc_utils.print_warning(
-                    ">> Exit command received from RacecarSim, closing script..."
-                )
-                break
-            elif header == self.Header.error:
-                error = int(data[1]) if len(data) > 1 else self.Error.generic
-                self.__handle_error(error)
-            else:
-                rc_utils.print_error(
-                    f">> Error: unexpected packet with header [{header}] received from RacecarSim, closing script..."
+                    ">> RacecarSim abandoned a block message, continuing..."
                 )
-                self.__send_header(self.Header.error)
-                break
+                return True
+            self.__handle_error(error)
+        else:
+            rc_utils.print_error(
+                f">> Error: unexpected packet with header [{header}] received from RacecarSim, closing script..."
+            )
+            self.__send_header(self.Header.error)
+            return False
+
+        self.__hold_exchanges_until_command()
+        self.__send_header(self.Header.python_finished)
+        return True
 
-            self.__send_header(self.Header.python_finished)
+    def __hold_exchanges_until_command(self) -> None:
+        # RacecarSim answers no requests between frames, so without sequence ids, other
+        # threads must not start an exchange until the next command arrives, or the
+        # command would be mistaken for their reply
+        if (
+            not self.__features & self.Feature.sequence_ids
+            and not self.__is_between_frames
+        ):
+            self.__get_exchange_lock().acquire()
+            self.__is_between_frames = True
 
     def set_start_update(
         self,
@@ -208,30 +891,232 @@ class RacecarSim(Racecar):
         self.__update_slow = update_slow
 
     def get_delta_time(self) -> float:
-        if self.__delta_time < 0:
+        return self.__cache.get(
+            self.Header.racecar_get_delta_time, self.__request_delta_time
+        )
+
+    def __request_delta_time(self) -> float:
+        with self.__exchange():
             self.__send_header(self.Header.racecar_get_delta_time)
-            [value] = struct.unpack("f", self.__receive_data())
-            self.__delta_time = value
-        return self.__delta_time
+            [value] = self.__receive_values("f")
+        return value
 
     def set_update_slow_time(self, update_slow_time: float = 1.0) -> None:
         self.__update_slow_time = update_slow_time
 
+    def set_frame_bundle(self, sensors: Sensor) -> None:
+        """
+        Sets the sensors which RacecarSim sends in a single reply at the start of each
+        frame, instead of one exchange per sensor access.
+
+        Args:
+            sensors: The sensors to include in the bundle, combined with the | operator.
+
+        Note:
+            The delta time is included in every bundle.  If the connected version of
+            RacecarSim does not support frame bundles, each sensor is requested
+            separately when it is accessed.
+
+        Example::
+
+            # Receive the color image, LIDAR scan, and controller state in one reply
+            rc.set_frame_bundle(
+                rc.Sensor.color_image | rc.Sensor.lidar | rc.Sensor.controller
+            )
+        """
+        self.__frame_bundle = self.Sensor(sensors)
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Returns how many sensor accesses were served from the per-frame cache, and how
+        many required a request to RacecarSim.
+
+        Returns:
+            A dictionary with the number of "hits" and "misses" since the script
+            started, along with the number of requests whose reply was "lost" and the
+            number of misses "reused" from an earlier frame because every attempt to
+            request them was lost.
+
+        Note:
+            Values received in a frame bundle or controller snapshot are cached without
+            a miss, so they count as hits when accessed.
+
+        Example::
+
+            stats = rc.get_cache_stats()
+            print(f"{stats['misses']} requests sent to RacecarSim")
+        """
+        return self.__cache.get_stats()
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the round trip time and reply size of the requests sent to RacecarSim,
+        for each type of request.
+
+        Returns:
+            A dictionary from the name of each request header to the number of
+            requests whose reply was received ("count"), the 50th, 95th, and 99th
+            percentile and the maximum round trip time in milliseconds ("p50_ms",
+            "p95_ms", "p99_ms", and "max_ms"), and the mean and total number of bytes
+            received in reply ("mean_bytes" and "total_bytes").
+
+        Note:
+            A round trip is timed from sending the request to receiving the final
+            message of its reply, including every fragment of a block message.  The
+            percentiles are estimated from fixed histogram buckets, each about 19%
+            wider than the last.
+
+        Example::
+
+            # Print how long the color image usually takes to arrive
+            stats = rc.get_stats()["camera_get_color_image"]
+            print(f"Color image: {stats['p50_ms']:.1f} ms")
+        """
+        stats: Dict[str, Dict[str, float]] = {}
+        with self.__stats_lock:
+            for (header, round_trip_time) in self.__round_trip_times.items():
+                reply_size = self.__reply_sizes[header]
+                stats[self.Header(header).name] = {
+                    "count": round_trip_time.get_count(),
+                    "p50_ms": round_trip_time.get_percentile(50) * 1000,
+                    "p95_ms": round_trip_time.get_percentile(95) * 1000,
+                    "p99_ms": round_trip_time.get_percentile(99) * 1000,
+                    "max_ms": round_trip_time.get_max() * 1000,
+                    "mean_bytes": reply_size.get_mean(),
+                    "total_bytes": reply_size.get_total(),
+                }
+        return stats
+
+    def print_stats(self) -> None:
+        """
+        Prints a table of the statistics returned by get_stats.
+
+        Example::
+
+            # Print the statistics once per second
+            def update_slow():
+                rc.print_stats()
+
+            rc.set_start_update(start, update, update_slow)
+        """
+        stats = self.get_stats()
+        print(
+            f">> {'Request':<32}{'count':>8}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'max ms':>9}{'KB/req':>9}"
+        )
+        for (name, values) in sorted(stats.items()):
+            print(
+                f"   {name:<32}{values['count']:>8}{values['p50_ms']:>9.2f}"
+                f"{values['p95_ms']:>9.2f}{values['p99_ms']:>9.2f}"
+                f"{values['max_ms']:>9.2f}{values['mean_bytes'] / 1024:>9.1f}"
+            )
+
+    def __request_frame_bundle(self) -> None:
+        with self.__exchange():
+            self.__send_data(
+                struct.pack(
+                    "BB", self.Header.racecar_get_frame_bundle, self.__frame_bundle
+                )
+            )
+
+            # The bundle is described by a short message, followed by a block message
+            # padded to a whole number of fragments
+            try:
+                [num_fragments, fragment_size, depth_size] = self.__receive_values(
+                    "III"
+                )
+            except (TimeoutError, ConnectionError):
+                # RacecarSim streams the block regardless, so tell it to stop before
+                # giving up on the bundle
+                if (
+                    self.__features & self.Feature.fragment_stream
+                    and not self.__features & self.Feature.shared_memory
+                ):
+                    self.__send_data(
+                        struct.pack("BB", self.Header.python_fragments_missing, 0)
+                    )
+                raise
+            raw_bytes = self.__receive_block(
+                SharedMemorySim.Stream.frame_bundle,
+                num_fragments,
+                num_fragments * fragment_size,
+            )
+
+        # The sections of the bundle appear in a fixed order, with each sensor present
+        # only if it was requested
+        sections = [
+            (None, struct.calcsize("f")),
+            (
+                self.Sensor.controller,
+                struct.calcsize(controller_sim.ControllerSim._SNAPSHOT_FORMAT),
+            ),
+            (self.Sensor.physics, struct.calcsize("ffffff")),
+            (self.Sensor.lidar, self.lidar.get_num_samples() * 4),
+            (self.Sensor.depth_image, depth_size),
+            (
+                self.Sensor.color_image,
+                self.camera.get_width()
+                * self.camera.get_height()
+                * (3 if self.__features & self.Feature.pixel_format else 4),
+            ),
+        ]
+        offset = 0
+        for (sensor, size) in sections:
+            if sensor is not None and not self.__frame_bundle & sensor:
+                continue
+            section = raw_bytes[offset : offset + size]
+            offset += size
+
+            if sensor is None:
+                [delta_time] = struct.unpack("f", section)
+                self.__cache.set(self.Header.racecar_get_delta_time, delta_time)
+            elif sensor == self.Sensor.controller:
+                self.controller._ControllerSim__load_snapshot(section)
+            elif sensor == self.Sensor.physics:
+                self.physics._PhysicsSim__load_values(section)
+            elif sensor == self.Sensor.lidar:
+                self.lidar._LidarSim__load_samples(section)
+            elif sensor == self.Sensor.depth_image:
+                self.camera._CameraSim__load_depth_image(section)
+            elif sensor == self.Sensor.color_image:
+                self.camera._CameraSim__load_color_image(section)
+
     def __handle_update(self) -> None:
+        # The previous frame ends once RacecarSim sends the next update command
+        self.profiler.end_frame()
+
+        self.profiler.start_phase("modules")
+        if self.__frame_bundle and self.__features & self.Feature.frame_bundle:
+            try:
+                self.__request_frame_bundle()
+            except (TimeoutError, ConnectionError):
+                # If the bundle is lost, each sensor is requested when it is accessed
+                pass
+
+        self.profiler.start_phase("update")
         self.__update()
 
-        self.__delta_time = -1
         if self.__update_slow is not None:
             self.__update_slow_counter -= self.get_delta_time()
             if self.__update_slow_counter < 0:
+                self.profiler.start_phase("update_slow")
                 self.__update_slow()
                 self.__update_slow_counter = self.__update_slow_time
 
-        self.camera._CameraSim__update()
-        self.controller._ControllerSim__update()
-        self.lidar._LidarSim__update()
+        # Sensor data received during this frame is stale by the next frame
+        self.profiler.start_phase("modules")
+        self.__cache.clear()
+        rc_utils.clear_frame_cache()
+
+        # Time spent waiting for the next update command is not spent in Python
+        self.profiler.start_phase("sleep")
 
     def __handle_sigint(self, signal_received: int, frame) -> None:
+        self.__send_exit()
+        print(">> Closing script...")
+        exit(0)
+
+    def __send_exit(self) -> None:
         # Send exit command to sync port if we are in the middle of servicing a start
         # or update call; otherwise send it to the async port
         is_async = not self.__in_call
@@ -242,9 +1127,6 @@ class RacecarSim(Racecar):
         )
         self.__send_header(self.Header.python_exit, is_async)
 
-        print(">> Closing script...")
-        exit(0)
-
     def __handle_error(self, error: Error):
         text = ">> Error: "
         if error == self.Error.generic:
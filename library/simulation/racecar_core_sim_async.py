@@ -0,0 +1,267 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Manages communication with RacecarSim from an asyncio event loop.
+"""
+
+import asyncio
+import collections
+import threading
+from typing import Any, Callable, Deque, Optional, Tuple
+
+import numpy as np
+from nptyping import NDArray
+
+import camera_sim
+import lidar_sim
+from racecar_core_sim import RacecarSim
+
+
+class _DatagramChannel(asyncio.DatagramProtocol):
+    """
+    Queues the datagrams received by the event loop for a thread which blocks on them,
+    and sends datagrams from any thread through the event loop.
+
+    Once the channel is closed, threads which wait on it or use it raise
+    ConnectionError, so that they stop when the event loop does.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.__loop = loop
+        self.__loop_thread: int = threading.get_ident()
+        self.__transport: Optional[asyncio.DatagramTransport] = None
+        self.__datagrams: Deque[bytes] = collections.deque()
+        self.__condition = threading.Condition()
+        self.__exchange_lock = threading.RLock()
+        self.__is_closed: bool = False
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.__transport = transport
+
+    def datagram_received(self, data: bytes, address: Tuple[str, int]) -> None:
+        with self.__condition:
+            self.__datagrams.append(data)
+            self.__condition.notify()
+
+    def error_received(self, exc: Exception) -> None:
+        # ICMP errors (such as RacecarSim not yet listening) are reported here, but the
+        # blocking protocol already retries or times out on its own
+        pass
+
+    def sendto(self, data: bytes, address: Tuple[str, int]) -> None:
+        self.__check_open()
+
+        # Transports are not thread-safe, so other threads hand the send to the loop
+        if threading.get_ident() == self.__loop_thread:
+            self.__transport.sendto(data, address)
+        else:
+            self.__loop.call_soon_threadsafe(self.__transport.sendto, data, address)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        with self.__condition:
+            self.__condition.wait_for(
+                lambda: len(self.__datagrams) > 0 or self.__is_closed, timeout
+            )
+            self.__check_open()
+            return len(self.__datagrams) > 0
+
+    def receive(self) -> bytes:
+        with self.__condition:
+            self.__condition.wait_for(
+                lambda: len(self.__datagrams) > 0 or self.__is_closed
+            )
+            self.__check_open()
+            return self.__datagrams.popleft()
+
+    def close(self) -> None:
+        """
+        Wakes every thread which waits on the channel, and refuses any further use.
+        """
+        with self.__condition:
+            self.__is_closed = True
+            self.__condition.notify_all()
+
+    def __check_open(self) -> None:
+        if self.__is_closed:
+            raise ConnectionError("The connection to RacecarSim was closed.")
+
+    def get_exchange_lock(self) -> threading.RLock:
+        return self.__exchange_lock
+
+
+class RacecarSimAsync(RacecarSim):
+    """
+    A RacecarSim whose go() is a coroutine, and whose async sensor requests are
+    awaitable, so that notebooks and tools can run other work on the event loop while
+    the car is driven or while sensor data arrives.
+
+    The event loop receives every datagram.  The start and update functions run in an
+    executor thread, in which sensor accesses block on the datagrams delivered by the
+    event loop, so they keep their frame-by-frame semantics.  Awaitable sensor requests
+    run in another executor thread, and are sent one at a time to the async port of
+    RacecarSim from the socket which RacecarSim assigned to this car.
+
+    The socket is read by the event loop rather than by the threads which wait on it,
+    so sequence ids are not negotiated, and exchanges are instead made one at a time.
+    Since RacecarSim sends no commands while the update function runs, and the script
+    otherwise holds the socket while it waits for the next command, awaitable requests
+    are answered while the update function runs.
+
+    Note:
+        Awaitable requests wait until go() has connected to RacecarSim, and raise
+        ConnectionError if it could not connect.
+
+    Example::
+
+        rc = RacecarSimAsync()
+        rc.set_start_update(start, update)
+
+        # Drive the car while also fetching images in another coroutine
+        async def log_images():
+            while True:
+                image = await rc.camera.get_color_image_async()
+                await asyncio.sleep(1)
+
+        await asyncio.gather(rc.go(), log_images())
+    """
+
+    _RacecarSim__FEATURES = (
+        RacecarSim._RacecarSim__FEATURES & ~RacecarSim.Feature.sequence_ids
+    )
+
+    def __init__(self, isHeadless: bool = False) -> None:
+        super().__init__(isHeadless)
+        self.camera = CameraSimAsync(self)
+        self.lidar = LidarSimAsync(self)
+
+        # The channel of the socket, which is created on the event loop
+        self.__channel: Optional[_DatagramChannel] = None
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__opening: Optional[asyncio.Future] = None
+        self.__request_lock: Optional[asyncio.Lock] = None
+
+        # Resolves to whether go() completed the connect handshake
+        self.__connected: Optional[asyncio.Future] = None
+
+    async def go(self) -> None:
+        """
+        Connects to RacecarSim and runs the start and update functions until the
+        script is exited, without blocking the event loop.
+        """
+        await self.__open()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, super().go)
+        finally:
+            # If go() is cancelled or the script exits (such as on Ctrl-C), the
+            # executor thread would otherwise keep waiting for RacecarSim, and the
+            # interpreter waits for it before exiting
+            self.__channel.close()
+            self.__set_connected(False)
+
+    async def __request(self, function: Callable[[], Any]) -> Any:
+        # The features used to make the request are only known once connected
+        await self.__open()
+        if not await asyncio.shield(self.__connected):
+            raise ConnectionError("Unable to connect to RacecarSim.")
+
+        # Requests are not tagged, so only one is made at a time
+        async with self.__request_lock:
+            return await asyncio.get_running_loop().run_in_executor(None, function)
+
+    async def __open(self) -> None:
+        if self.__opening is None:
+            self.__opening = asyncio.ensure_future(self.__create_channels())
+        await self.__opening
+
+    async def __create_channels(self) -> None:
+        self.__loop = asyncio.get_running_loop()
+        self.__request_lock = asyncio.Lock()
+        self.__connected = self.__loop.create_future()
+
+        (_, self.__channel) = await self.__loop.create_datagram_endpoint(
+            lambda: _DatagramChannel(self.__loop), sock=self._RacecarSim__socket
+        )
+
+    def _RacecarSim__connect(self) -> bool:
+        # Called by go() in its executor thread, so awaitable requests are released
+        # through the event loop
+        is_connected = False
+        try:
+            is_connected = super()._RacecarSim__connect()
+            return is_connected
+        finally:
+            if not self.__loop.is_closed():
+                self.__loop.call_soon_threadsafe(self.__set_connected, is_connected)
+
+    def __set_connected(self, is_connected: bool) -> None:
+        if not self.__connected.done():
+            self.__connected.set_result(is_connected)
+
+    def __get_channel(self) -> Optional[_DatagramChannel]:
+        return self.__channel
+
+    # Once the event loop owns the socket, the socket access of RacecarSim is routed
+    # through its channel
+
+    def _RacecarSim__socket_send(self, data: bytes, is_async: bool) -> None:
+        channel = self.__get_channel()
+        if channel is None:
+            super()._RacecarSim__socket_send(data, is_async)
+        elif is_async:
+            channel.sendto(data, self._RacecarSim__UNITY_ASYNC_PORT)
+        else:
+            channel.sendto(data, self._RacecarSim__UNITY_PORT)
+
+    def _RacecarSim__socket_receive(self, buffer_size: int) -> bytes:
+        channel = self.__get_channel()
+        if channel is None:
+            return super()._RacecarSim__socket_receive(buffer_size)
+        return channel.receive()[:buffer_size]
+
+    def _RacecarSim__socket_receive_into(self, buffer: memoryview) -> int:
+        channel = self.__get_channel()
+        if channel is None:
+            return super()._RacecarSim__socket_receive_into(buffer)
+        data = channel.receive()
+        num_bytes = min(len(data), len(buffer))
+        buffer[:num_bytes] = data[:num_bytes]
+        return num_bytes
+
+    def _RacecarSim__socket_wait(self, timeout: Optional[float]) -> bool:
+        channel = self.__get_channel()
+        if channel is None:
+            return super()._RacecarSim__socket_wait(timeout)
+        return channel.wait(timeout)
+
+    def _RacecarSim__get_exchange_lock(self) -> threading.RLock:
+        channel = self.__get_channel()
+        if channel is None:
+            return super()._RacecarSim__get_exchange_lock()
+        return channel.get_exchange_lock()
+
+
+class CameraSimAsync(camera_sim.CameraSim):
+    def __init__(self, racecar: RacecarSimAsync) -> None:
+        super().__init__(racecar)
+        self.__racecar = racecar
+
+    async def get_color_image_async(self) -> NDArray[(480, 640, 3), np.uint8]:
+        return await self.__racecar._RacecarSimAsync__request(
+            super().get_color_image_async
+        )
+
+    async def get_depth_image_async(self) -> NDArray[(480, 640), np.float32]:
+        return await self.__racecar._RacecarSimAsync__request(
+            super().get_depth_image_async
+        )
+
+
+class LidarSimAsync(lidar_sim.LidarSim):
+    def __init__(self, racecar: RacecarSimAsync) -> None:
+        super().__init__(racecar)
+        self.__racecar = racecar
+
+    async def get_samples_async(self) -> NDArray[720, np.float32]:
+        return await self.__racecar._RacecarSimAsync__request(super().get_samples_async)
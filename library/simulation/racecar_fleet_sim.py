@@ -0,0 +1,110 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Drives several simulated racecars from a single Python process.
+"""
+
+import selectors
+import struct
+from signal import signal, SIGINT
+from typing import List
+
+from racecar_core_sim import RacecarSim
+
+
+class RacecarFleetSim:
+    """
+    Hosts several RacecarSim instances, each assigned its own car by RacecarSim, and
+    runs their start and update functions from a single selector.
+
+    This avoids starting one interpreter per car, each of which would load OpenCV and
+    NumPy and poll its own socket.  The cars are serviced one command at a time, so
+    a slow update function delays the other cars in the same way as it would delay
+    its own.
+
+    Example::
+
+        fleet = RacecarFleetSim(2)
+        (rc_a, rc_b) = fleet.racecars
+
+        # Each racecar runs its own start and update functions
+        rc_a.set_start_update(start_a, update_a)
+        rc_b.set_start_update(start_b, update_b)
+
+        # Run every racecar until RacecarSim exits all of them
+        fleet.go()
+    """
+
+    def __init__(self, num_cars: int, isHeadless: bool = False) -> None:
+        """
+        Creates the racecars of the fleet, which connect to RacecarSim in go().
+
+        Args:
+            num_cars: The number of racecars to drive.
+            isHeadless: Whether to disable the display module of each racecar.
+        """
+        assert num_cars > 0, f"num_cars ({num_cars}) must be greater than 0."
+
+        self.racecars: List[RacecarSim] = [
+            RacecarSim(isHeadless) for _ in range(num_cars)
+        ]
+
+        # Each RacecarSim installs its own SIGINT handler, so replace them with one
+        # which tells RacecarSim that every car is exiting
+        signal(SIGINT, self.__handle_sigint)
+
+    def go(self) -> None:
+        """
+        Connects each racecar to RacecarSim, then services start and update commands
+        for all of them until RacecarSim exits every racecar.
+
+        Note:
+            The racecars connect one at a time, so they are assigned car numbers in
+            the order of the racecars list.
+        """
+        selector = selectors.DefaultSelector()
+        try:
+            for racecar in self.racecars:
+                if racecar._RacecarSim__connect():
+                    selector.register(
+                        racecar._RacecarSim__socket, selectors.EVENT_READ, racecar
+                    )
+
+            while len(selector.get_map()) > 0:
+                for (key, _) in selector.select():
+                    racecar: RacecarSim = key.data
+
+                    # A readable socket may hold a late reply rather than a command,
+                    # which is skipped rather than treated as an unexpected command
+                    data = racecar._RacecarSim__poll_command()
+                    if data is None or not self.__is_command(data):
+                        continue
+                    if not racecar._RacecarSim__handle_command(data):
+                        selector.unregister(key.fileobj)
+        finally:
+            selector.close()
+            for racecar in self.racecars:
+                racecar._RacecarSim__disconnect()
+
+    @staticmethod
+    def __is_command(data: bytes) -> bool:
+        # Without sequence ids, replies arrive on the same socket as commands, so a
+        # command is told apart by its header, and an error also by its size
+        Header = RacecarSim.Header
+        header = int(data[0])
+        if header == Header.error.value:
+            return len(data) == struct.calcsize("BB")
+        return header in (
+            Header.unity_start.value,
+            Header.unity_update.value,
+            Header.unity_exit.value,
+        )
+
+    def __handle_sigint(self, signal_received: int, frame) -> None:
+        for racecar in self.racecars:
+            racecar._RacecarSim__send_exit()
+
+        print(">> Closing script...")
+        exit(0)
@@ -0,0 +1,717 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+A stand-in for RacecarSim which speaks its UDP protocol with synthetic or recorded
+sensor data, so that racecar_core_sim can be run and benchmarked without Unity.
+
+Usage::
+
+    # Serve 600 frames at 60 frames per second, then exit
+    python racecar_sim_server.py --frames 600
+
+    # Serve recorded sensor data as fast as the Python script can consume it
+    python racecar_sim_server.py --rate 0 --recording recording.npz
+"""
+
+import argparse
+import math
+import os
+import random
+import select
+import socket
+import struct
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2 as cv
+import numpy as np
+from nptyping import NDArray
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from camera import Camera
+from racecar_core_sim import RacecarSim
+from controller_sim import ControllerSim
+from shared_memory_sim import SharedMemorySim
+import racecar_utils as rc_utils
+
+Header = RacecarSim.Header
+Error = RacecarSim.Error
+Feature = RacecarSim.Feature
+PixelFormat = Camera.PixelFormat
+Sensor = RacecarSim.Sensor
+Stream = SharedMemorySim.Stream
+
+
+class RacecarSimServer:
+    """
+    Listens on the RacecarSim ports, accepts a connection from a Python script, and
+    drives its start and update functions at a fixed frame rate.
+    """
+
+    # The protocol version and ports expected by racecar_core_sim
+    __VERSION = RacecarSim._RacecarSim__VERSION
+    __UNITY_PORT = RacecarSim._RacecarSim__UNITY_PORT
+    __UNITY_ASYNC_PORT = RacecarSim._RacecarSim__UNITY_ASYNC_PORT
+
+    # The dimensions of the data sent for each sensor
+    __WIDTH = 640
+    __HEIGHT = 480
+    __DEPTH_WIDTH = __WIDTH // 8
+    __DEPTH_HEIGHT = __HEIGHT // 8
+    __NUM_SAMPLES = 720
+
+    # The number of fragments used to send a color image, and the largest fragment
+    # used for other block messages
+    __COLOR_FRAGMENTS = 32
+    __MAX_FRAGMENT_SIZE = __WIDTH * __HEIGHT * 4 // __COLOR_FRAGMENTS
+
+    # Seconds to wait for Python in the middle of a block message before abandoning it
+    __BLOCK_TIMEOUT = 1
+
+    def __init__(
+        self,
+        frame_rate: float = 60,
+        num_frames: Optional[int] = None,
+        features: Feature = Feature(sum(Feature)),
+        recording: Optional[str] = None,
+        timeout: float = 10,
+        loss_rate: float = 0,
+    ) -> None:
+        """
+        Creates a stand-in RacecarSim server.
+
+        Args:
+            frame_rate: The number of update calls per second, or 0 to send each
+                update as soon as the previous one finishes.
+            num_frames: The number of update calls after which the server tells the
+                Python script to exit, or None to run until the script exits.
+            features: The protocol extensions which the server offers to Python.
+            recording: The path of a .npz file containing any of the arrays "color"
+                (N x 480 x 640 x 3, BGR), "depth" (N x rows x cols, cm), and "lidar"
+                (N x 720, cm), which are played back in a loop instead of synthetic
+                data.
+            timeout: The number of seconds to wait for the Python script to finish a
+                frame before reporting a timeout error.
+            loss_rate: The fraction of datagrams other than commands which are
+                dropped instead of sent, to test how Python recovers from lost data.
+        """
+        self.__frame_rate = frame_rate
+        self.__num_frames = num_frames
+        self.__offered_features = Feature(features)
+        self.__timeout = timeout
+        self.__loss_rate = loss_rate
+        self.__random = random.Random(0)
+
+        self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__socket.bind(self.__UNITY_PORT)
+        self.__async_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__async_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__async_socket.bind(self.__UNITY_ASYNC_PORT)
+
+        # Connection state, set by the connect handshake
+        self.__client: Optional[Tuple[str, int]] = None
+        self.__features = Feature(0)
+        self.__receive_window: int = 0
+        self.__shared_memory: Optional[SharedMemorySim] = None
+        self.__sequences: Dict[Stream, int] = {stream: 0 for stream in Stream}
+
+        # With sequence ids, the id which prefixes our messages (0 for commands, or
+        # that of the request being handled), and requests from other Python threads
+        # which arrive in the middle of sending a block message
+        self.__sequence: Optional[int] = None
+        self.__deferred: List[Tuple[socket.socket, Any, bytes]] = []
+        self.__running = False
+
+        # Simulation state
+        self.__frame: int = 0
+        self.__delta_time: float = 1 / frame_rate if frame_rate > 0 else 1 / 60
+        self.__speed: float = 0
+        self.__angle: float = 0
+        self.__max_speed: float = 0.25
+
+        # Statistics about the frames served so far
+        self.__stats: Dict[str, float] = {
+            "frames": 0,
+            "requests": 0,
+            "bytes_sent": 0,
+            "datagrams_dropped": 0,
+            "python_seconds": 0,
+            "elapsed_seconds": 0,
+        }
+
+        self.__handlers: Dict[Header, Callable[[socket.socket, Any, bytes], None]] = {
+            Header.racecar_get_delta_time: self.__handle_get_delta_time,
+            Header.camera_get_color_image: self.__handle_get_color_image,
+            Header.camera_get_color_image_region: self.__handle_get_color_image_region,
+            Header.camera_get_color_image_format: self.__handle_get_color_image_format,
+            Header.camera_get_depth_image: self.__handle_get_depth_image,
+            Header.camera_get_width: self.__handle_get_width,
+            Header.camera_get_height: self.__handle_get_height,
+            Header.controller_is_down: self.__handle_controller_button,
+            Header.controller_was_pressed: self.__handle_controller_button,
+            Header.controller_was_released: self.__handle_controller_button,
+            Header.controller_get_trigger: self.__handle_get_trigger,
+            Header.controller_get_joystick: self.__handle_get_joystick,
+            Header.controller_get_snapshot: self.__handle_get_snapshot,
+            Header.drive_set_speed_angle: self.__handle_set_speed_angle,
+            Header.drive_stop: self.__handle_stop,
+            Header.drive_set_max_speed: self.__handle_set_max_speed,
+            Header.lidar_get_num_samples: self.__handle_get_num_samples,
+            Header.lidar_get_samples: self.__handle_get_samples,
+            Header.physics_get_linear_acceleration: self.__handle_get_linear_acceleration,
+            Header.physics_get_angular_velocity: self.__handle_get_angular_velocity,
+            Header.racecar_get_frame_bundle: self.__handle_get_frame_bundle,
+        }
+
+        self.__load_data(recording)
+
+    def run(self) -> Dict[str, float]:
+        """
+        Waits for a Python script to connect, then calls its start function followed
+        by update once per frame until the script exits or num_frames is reached.
+
+        Returns:
+            Statistics about the session: the number of frames and requests served,
+            the bytes sent, the seconds spent waiting on Python, and the total elapsed
+            seconds.
+
+        Example::
+
+            # Run the server in the background of a test which drives a RacecarSim
+            server = RacecarSimServer(frame_rate=0, num_frames=100)
+            thread = threading.Thread(target=server.run, daemon=True)
+            thread.start()
+        """
+        print(">> RacecarSim stand-in listening, awaiting connection from Python...")
+        self.__running = True
+        self.__await_connection()
+        start_time = time.perf_counter()
+
+        if self.__running:
+            self.__run_frame(Header.unity_start)
+
+        next_frame_time = time.perf_counter()
+        while self.__running:
+            if self.__num_frames is not None and self.__frame >= self.__num_frames:
+                self.__sequence = 0
+                self.__send(
+                    self.__socket,
+                    self.__client,
+                    struct.pack("B", Header.unity_exit),
+                    False,
+                )
+                break
+
+            # Service async requests until the next frame is due
+            if self.__frame_rate > 0:
+                next_frame_time += 1 / self.__frame_rate
+                while self.__running and time.perf_counter() < next_frame_time:
+                    self.__service(next_frame_time - time.perf_counter())
+
+            self.__frame += 1
+            self.__run_frame(Header.unity_update)
+
+        self.__stats["frames"] = self.__frame
+        self.__stats["elapsed_seconds"] = time.perf_counter() - start_time
+        self.__running = False
+        self.__socket.close()
+        self.__async_socket.close()
+        if self.__shared_memory is not None:
+            self.__shared_memory.close()
+
+        frames_per_second = self.__stats["frames"] / max(
+            self.__stats["elapsed_seconds"], 1e-9
+        )
+        print(
+            f">> RacecarSim stand-in served {self.__frame} frames and "
+            f"{self.__stats['requests']} requests ({frames_per_second:.1f} frames/s)."
+        )
+        return self.__stats
+
+    def __await_connection(self) -> None:
+        while self.__running:
+            data, address = self.__async_socket.recvfrom(64)
+            if int(data[0]) != Header.connect.value:
+                continue
+
+            version = int(data[1])
+            if version < self.__VERSION:
+                self.__send_error(self.__async_socket, address, Error.python_outdated)
+                continue
+            if version > self.__VERSION:
+                self.__send_error(
+                    self.__async_socket, address, Error.racecarsim_outdated
+                )
+                continue
+
+            # Agree on the extensions offered by both sides
+            handshake_size = struct.calcsize("BBII")
+            if len(data) >= handshake_size:
+                [_, _, features, window] = struct.unpack("BBII", data[:handshake_size])
+                self.__features = Feature(features & self.__offered_features)
+                self.__receive_window = window
+
+            # Attach to Python's shared memory block, if it offered one
+            if self.__features & Feature.shared_memory:
+                try:
+                    self.__shared_memory = SharedMemorySim(
+                        data[handshake_size:].decode()
+                    )
+                except (OSError, ValueError):
+                    self.__features &= ~Feature.shared_memory
+
+            self.__client = address
+            self.__send(
+                self.__async_socket,
+                address,
+                struct.pack("BBI", Header.connect, 0, self.__features),
+            )
+            rc_utils.print_colored(
+                f">> Python connected from {address} "
+                f"(features: {self.__features!r}).",
+                rc_utils.TerminalColor.green,
+            )
+            return
+
+    def __run_frame(self, header: Header) -> None:
+        """
+        Sends a start or update command and services requests until Python finishes.
+        """
+        self.__update_state()
+        self.__frame_finished = False
+        self.__sequence = 0
+        self.__send(self.__socket, self.__client, struct.pack("B", header), False)
+
+        start_time = time.perf_counter()
+        deadline = start_time + self.__timeout
+        while self.__running and not self.__frame_finished:
+            if time.perf_counter() > deadline:
+                rc_utils.print_error(">> Python took too long to finish the frame.")
+                self.__send_error(self.__socket, self.__client, Error.timeout)
+                self.__running = False
+                break
+            self.__service(deadline - time.perf_counter())
+        self.__stats["python_seconds"] += time.perf_counter() - start_time
+
+    def __service(self, timeout: float) -> None:
+        """
+        Handles at most one packet received on either port within timeout seconds.
+        """
+        ready = select.select(
+            [self.__socket, self.__async_socket], [], [], max(0, timeout)
+        )
+        if not ready[0]:
+            return
+        sock = ready[0][0]
+        data, address = sock.recvfrom(65536)
+        self.__handle_packet(sock, address, data)
+
+        while len(self.__deferred) > 0:
+            self.__handle_packet(*self.__deferred.pop(0))
+
+    def __handle_packet(self, sock: socket.socket, address: Any, data: bytes) -> None:
+        if self.__features & Feature.sequence_ids:
+            [self.__sequence] = struct.unpack_from("H", data)
+            data = data[struct.calcsize("H") :]
+        header = int(data[0])
+        if header == Header.python_finished.value:
+            self.__frame_finished = True
+        elif header == Header.python_exit.value:
+            rc_utils.print_warning(">> Exit command received from Python.")
+            self.__running = False
+        elif header == Header.error.value:
+            error = int(data[1]) if len(data) > 1 else Error.generic
+            rc_utils.print_error(f">> Error received from Python: {Error(error)!r}")
+            self.__running = False
+        elif header == Header.connect.value:
+            # Python repeats the handshake until it sees our reply
+            self.__send(
+                sock, address, struct.pack("BBI", Header.connect, 0, self.__features)
+            )
+        elif header in (
+            Header.python_send_next.value,
+            Header.python_fragment_ack.value,
+            Header.python_fragments_missing.value,
+        ):
+            # A reply to a block message which arrives after the block was finished or
+            # abandoned is stale, and Python does not expect an answer to it
+            pass
+        elif header in self.__handlers:
+            self.__stats["requests"] += 1
+            self.__handlers[Header(header)](sock, address, data)
+        else:
+            rc_utils.print_error(
+                f">> Unexpected header [{header}] received from Python."
+            )
+            self.__send_error(sock, address, Error.generic)
+            self.__running = False
+
+    ####################################################################################
+    # Sending
+    ####################################################################################
+
+    def __send(
+        self, sock: socket.socket, address: Any, data: bytes, droppable: bool = True
+    ) -> None:
+        if droppable and self.__random.random() < self.__loss_rate:
+            self.__stats["datagrams_dropped"] += 1
+            return
+        if self.__features & Feature.sequence_ids and self.__sequence is not None:
+            data = struct.pack("H", self.__sequence) + data
+        self.__stats["bytes_sent"] += len(data)
+        sock.sendto(data, address)
+
+    def __send_error(self, sock: socket.socket, address: Any, error: Error) -> None:
+        # Errors are never dropped, as Python would otherwise keep waiting for a reply
+        # for reasons which have nothing to do with how it handles loss
+        self.__send(sock, address, struct.pack("BB", Header.error, error), False)
+
+    def __send_block(
+        self,
+        sock: socket.socket,
+        address: Any,
+        stream: Stream,
+        payload: bytes,
+        num_fragments: int,
+    ) -> None:
+        # With shared memory, write the payload to the next slot of the stream and only
+        # send its sequence number
+        if self.__features & Feature.shared_memory:
+            sequence = self.__sequences[stream]
+            self.__sequences[stream] += 1
+            self.__shared_memory.write(stream, sequence, payload)
+            self.__send(sock, address, struct.pack("I", sequence))
+        else:
+            self.__send_fragmented(sock, address, payload, num_fragments)
+
+    def __send_fragmented(
+        self, sock: socket.socket, address: Any, payload: bytes, num_fragments: int
+    ) -> None:
+        # A single fragment is sent as a plain datagram without acknowledgement
+        if num_fragments == 1:
+            self.__send(sock, address, payload)
+            return
+
+        fragment_size = len(payload) // num_fragments
+        fragments = [
+            payload[i * fragment_size : (i + 1) * fragment_size]
+            for i in range(num_fragments)
+        ]
+
+        # Stop-and-wait: send each fragment once Python asks for the next one
+        if not self.__features & Feature.fragment_stream:
+            for fragment in fragments:
+                self.__send(sock, address, fragment)
+                if self.__await_header(sock, [Header.python_send_next]) is None:
+                    return
+            return
+
+        # Stream within Python's receive window until Python reports that no
+        # fragments are missing
+        window = max(1, self.__receive_window // fragment_size)
+        pending = list(range(num_fragments))
+        while True:
+            sent: List[int] = []
+            num_acknowledged = 0
+            missing: Optional[List[int]] = None
+            for index in pending:
+                while (
+                    missing is None
+                    and sum(1 for i in sent if i >= num_acknowledged) >= window
+                ):
+                    num_acknowledged, missing = self.__await_fragment_reply(
+                        sock, num_acknowledged
+                    )
+                if missing is not None:
+                    break
+                self.__send(sock, address, struct.pack("H", index) + fragments[index])
+                sent.append(index)
+
+            while missing is None:
+                num_acknowledged, missing = self.__await_fragment_reply(
+                    sock, num_acknowledged
+                )
+            if len(missing) == 0:
+                return
+            pending = missing
+
+    def __await_fragment_reply(
+        self, sock: socket.socket, num_acknowledged: int
+    ) -> Tuple[int, Optional[List[int]]]:
+        data = self.__await_header(
+            sock, [Header.python_fragment_ack, Header.python_fragments_missing]
+        )
+        if data is None:
+            # An abandoned block is finished as if no fragments were missing
+            return (num_acknowledged, [])
+        if data[0] == Header.python_fragment_ack.value:
+            return (max(num_acknowledged, int(data[1])), None)
+        return (num_acknowledged, list(data[2 : 2 + int(data[1])]))
+
+    def __await_header(
+        self, sock: socket.socket, headers: List[Header]
+    ) -> Optional[bytes]:
+        """
+        Waits for one of the given headers in the middle of a block message, or
+        returns None if the block message is abandoned.
+        """
+        while True:
+            ready = select.select([sock], [], [], self.__BLOCK_TIMEOUT)
+            if not ready[0]:
+                rc_utils.print_warning(
+                    ">> Python stopped responding during a block message."
+                )
+                return None
+            packet, address = sock.recvfrom(65536)
+            data = packet
+
+            # Requests from other Python threads are handled once the block is sent
+            if self.__features & Feature.sequence_ids:
+                [sequence] = struct.unpack_from("H", data)
+                if sequence != self.__sequence:
+                    self.__deferred.append((sock, address, packet))
+                    continue
+                data = data[struct.calcsize("H") :]
+
+            if int(data[0]) in headers:
+                return data
+            rc_utils.print_error(
+                f">> Expected {[h.name for h in headers]} but received [{data[0]}]."
+            )
+            self.__send_error(sock, self.__client, Error.fragment_mismatch)
+
+            # Python sends a request again once it sees the error, but anything else
+            # must still be handled
+            if int(data[0]) not in self.__handlers:
+                self.__deferred.append((sock, address, packet))
+            return None
+
+    ####################################################################################
+    # Sensor data
+    ####################################################################################
+
+    def __load_data(self, recording: Optional[str]) -> None:
+        self.__color_frames: List[NDArray[(480, 640, 4), np.uint8]] = []
+        self.__depth_frames: List[NDArray[(Any, Any), np.float32]] = []
+        self.__lidar_frames: List[NDArray[720, np.float32]] = []
+
+        if recording is not None:
+            data = np.load(recording)
+            for color_image in data.get("color", []):
+                rgba = np.empty((self.__HEIGHT, self.__WIDTH, 4), np.uint8)
+                rgba[:, :, 0:3] = color_image[:, :, 2::-1]
+                rgba[:, :, 3] = 255
+                self.__color_frames.append(rgba)
+            self.__depth_frames = [d.astype(np.float32) for d in data.get("depth", [])]
+            self.__lidar_frames = [s.astype(np.float32) for s in data.get("lidar", [])]
+
+        # Synthetic scene: a gray floor with a blue line, a gradient depth image, and a
+        # rectangular room around the LIDAR
+        self.__floor = np.zeros((self.__HEIGHT, self.__WIDTH, 4), np.uint8)
+        self.__floor[:, :, 0:3] = np.linspace(60, 140, self.__HEIGHT, dtype=np.uint8)[
+            :, np.newaxis, np.newaxis
+        ]
+        self.__floor[:, :, 3] = 255
+        self.__floor[self.__HEIGHT // 2 :, 300:340, 0:3] = (0, 0, 255)
+        rows = np.linspace(1000, 30, self.__DEPTH_HEIGHT, dtype=np.float32)
+        self.__depth = np.repeat(rows[:, np.newaxis], self.__DEPTH_WIDTH, axis=1)
+        angles = np.radians(np.arange(self.__NUM_SAMPLES) * 360 / self.__NUM_SAMPLES)
+        self.__room = (
+            200 / np.maximum(np.abs(np.cos(angles)), np.abs(np.sin(angles)))
+        ).astype(np.float32)
+
+    def __update_state(self) -> None:
+        # The blue line sways left and right, and the room rotates with the car
+        offset = int(100 * math.sin(self.__frame / 60))
+        self.__color_image = (
+            self.__color_frames[self.__frame % len(self.__color_frames)]
+            if len(self.__color_frames) > 0
+            else np.roll(self.__floor, offset, axis=1)
+        )
+        self.__depth_image = (
+            self.__depth_frames[self.__frame % len(self.__depth_frames)]
+            if len(self.__depth_frames) > 0
+            else self.__depth
+        )
+        self.__lidar_samples = (
+            self.__lidar_frames[self.__frame % len(self.__lidar_frames)]
+            if len(self.__lidar_frames) > 0
+            else np.roll(self.__room, offset)
+        )
+
+    def __get_physics(self) -> Tuple[float, float, float, float, float, float]:
+        speed = self.__speed * self.__max_speed
+        return (0, 0, speed, 0, -self.__angle * speed, 0)
+
+    def __get_color_bytes(
+        self, image: NDArray[(Any, Any, 4), np.uint8], pixel_format: PixelFormat
+    ) -> bytes:
+        bgr_image = cv.cvtColor(image, cv.COLOR_RGBA2BGR)
+        if pixel_format in Camera._CONVERSIONS:
+            return cv.cvtColor(bgr_image, Camera._CONVERSIONS[pixel_format]).tobytes()
+        return bgr_image.tobytes()
+
+    def __pad_fragments(self, payload: bytes) -> Tuple[bytes, int, int]:
+        # Pad the payload to a whole number of equally sized fragments, matching the
+        # layout expected by Python
+        num_fragments = math.ceil(len(payload) / self.__MAX_FRAGMENT_SIZE)
+        fragment_size = math.ceil(len(payload) / num_fragments)
+        payload += bytes(num_fragments * fragment_size - len(payload))
+        return (payload, num_fragments, fragment_size)
+
+    def __get_snapshot(self) -> bytes:
+        return struct.pack(ControllerSim._SNAPSHOT_FORMAT, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+    ####################################################################################
+    # Request handlers
+    ####################################################################################
+
+    def __handle_get_delta_time(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("f", self.__delta_time))
+
+    def __handle_get_color_image(self, sock, address, data: bytes) -> None:
+        self.__send_block(
+            sock,
+            address,
+            Stream.color_image,
+            self.__color_image.tobytes(),
+            self.__COLOR_FRAGMENTS,
+        )
+
+    def __handle_get_color_image_region(self, sock, address, data: bytes) -> None:
+        [_, top, left, bottom, right, scale] = struct.unpack("BHHHHB", data)
+        region = self.__color_image[top:bottom:scale, left:right:scale].tobytes()
+        region, num_fragments, _ = self.__pad_fragments(region)
+        self.__send_block(sock, address, Stream.color_image, region, num_fragments)
+
+    def __handle_get_color_image_format(self, sock, address, data: bytes) -> None:
+        [_, pixel_format, top, left, bottom, right, scale] = struct.unpack(
+            "BBHHHHB", data
+        )
+        region = self.__get_color_bytes(
+            self.__color_image[top:bottom:scale, left:right:scale],
+            PixelFormat(pixel_format),
+        )
+        region, num_fragments, _ = self.__pad_fragments(region)
+        self.__send_block(sock, address, Stream.color_image, region, num_fragments)
+
+    def __handle_get_depth_image(self, sock, address, data: bytes) -> None:
+        self.__send_block(
+            sock, address, Stream.depth_image, self.__depth_image.tobytes(), 1
+        )
+
+    def __handle_get_width(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("I", self.__WIDTH))
+
+    def __handle_get_height(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("I", self.__HEIGHT))
+
+    def __handle_controller_button(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("?", False))
+
+    def __handle_get_trigger(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("f", 0))
+
+    def __handle_get_joystick(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("ff", 0, 0))
+
+    def __handle_get_snapshot(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, self.__get_snapshot())
+
+    def __handle_set_speed_angle(self, sock, address, data: bytes) -> None:
+        [_, self.__speed, self.__angle] = struct.unpack("Bff", data)
+
+    def __handle_stop(self, sock, address, data: bytes) -> None:
+        self.__speed = 0
+        self.__angle = 0
+
+    def __handle_set_max_speed(self, sock, address, data: bytes) -> None:
+        [_, self.__max_speed] = struct.unpack("Bf", data)
+
+    def __handle_get_num_samples(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("I", self.__NUM_SAMPLES))
+
+    def __handle_get_samples(self, sock, address, data: bytes) -> None:
+        self.__send_block(
+            sock, address, Stream.lidar, self.__lidar_samples.tobytes(), 1
+        )
+
+    def __handle_get_linear_acceleration(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("fff", *self.__get_physics()[0:3]))
+
+    def __handle_get_angular_velocity(self, sock, address, data: bytes) -> None:
+        self.__send(sock, address, struct.pack("fff", *self.__get_physics()[3:6]))
+
+    def __handle_get_frame_bundle(self, sock, address, data: bytes) -> None:
+        sensors = Sensor(int(data[1]))
+        depth_bytes = self.__depth_image.tobytes()
+
+        # The sections appear in the order expected by RacecarSim.__request_frame_bundle
+        sections = [struct.pack("f", self.__delta_time)]
+        if sensors & Sensor.controller:
+            sections.append(self.__get_snapshot())
+        if sensors & Sensor.physics:
+            sections.append(struct.pack("ffffff", *self.__get_physics()))
+        if sensors & Sensor.lidar:
+            sections.append(self.__lidar_samples.tobytes())
+        if sensors & Sensor.depth_image:
+            sections.append(depth_bytes)
+        if sensors & Sensor.color_image:
+            sections.append(
+                self.__get_color_bytes(self.__color_image, PixelFormat.bgr)
+                if self.__features & Feature.pixel_format
+                else self.__color_image.tobytes()
+            )
+        payload, num_fragments, fragment_size = self.__pad_fragments(b"".join(sections))
+
+        self.__send(
+            sock,
+            address,
+            struct.pack(
+                "III",
+                num_fragments,
+                fragment_size,
+                len(depth_bytes) if sensors & Sensor.depth_image else 0,
+            ),
+        )
+        self.__send_block(sock, address, Stream.frame_bundle, payload, num_fragments)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--rate", type=float, default=60, help="frames per second (0 for unlimited)"
+    )
+    parser.add_argument(
+        "--frames", type=int, default=None, help="exit after this many frames"
+    )
+    parser.add_argument(
+        "--recording", default=None, help=".npz file of color, depth, and lidar data"
+    )
+    parser.add_argument(
+        "--loss",
+        type=float,
+        default=0,
+        help="fraction of datagrams to drop, other than commands",
+    )
+    parser.add_argument(
+        "--disable",
+        nargs="*",
+        default=[],
+        choices=[feature.name for feature in Feature],
+        help="protocol extensions to withhold from Python",
+    )
+    args = parser.parse_args()
+
+    features = Feature(sum(Feature))
+    for name in args.disable:
+        features &= ~Feature[name]
+
+    server = RacecarSimServer(
+        args.rate, args.frames, features, args.recording, loss_rate=args.loss
+    )
+    server.run()
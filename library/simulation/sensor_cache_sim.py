@@ -0,0 +1,114 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+The per-frame cache of sensor data received from RacecarSim.
+"""
+
+from typing import Any, Callable, Dict, Hashable
+
+
+class SensorCacheSim:
+    """
+    Stores the sensor data received from RacecarSim during the current frame, so that
+    repeated accesses within a frame are not sent over the network again.
+
+    Each value is keyed by the header of the request which fetches it, followed by
+    the arguments of that request, if any.
+
+    A request whose reply is lost is sent again, each time waiting longer for the
+    reply in case RacecarSim is only slow, and if every attempt is lost, the value
+    received for the same key in an earlier frame is reused, so that a dropped
+    datagram costs a frame of fresh data rather than the script.  Values which report
+    an event of a single frame, such as a button press, are never reused.
+    """
+
+    # The number of times a request is sent before reusing the previous value
+    __MAX_ATTEMPTS = 3
+
+    def __init__(self) -> None:
+        self.__values: Dict[Hashable, Any] = {}
+        self.__last_values: Dict[Hashable, Any] = {}
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__lost: int = 0
+        self.__reused: int = 0
+
+    def get(
+        self, key: Hashable, request: Callable[[], Any], is_event: bool = False
+    ) -> Any:
+        """
+        Returns the cached value for a key, requesting it from RacecarSim on the first
+        access in the current frame.
+
+        Args:
+            key: The request header and arguments which identify the value.
+            request: Fetches the value from RacecarSim if it is not cached, raising
+                TimeoutError or ConnectionError if the reply is lost.
+            is_event: Whether the value is True only in the frame an event happens,
+                in which case it is False rather than the value of an earlier frame
+                if every attempt is lost, so that the event is not reported twice.
+        """
+        if key in self.__values:
+            self.__hits += 1
+            return self.__values[key]
+
+        self.__misses += 1
+        for attempt in range(self.__MAX_ATTEMPTS):
+            try:
+                value = request()
+                break
+            except (TimeoutError, ConnectionError):
+                self.__lost += 1
+                if attempt + 1 < self.__MAX_ATTEMPTS:
+                    continue
+                if is_event:
+                    value = False
+                    break
+                if key not in self.__last_values:
+                    raise
+                value = self.__last_values[key]
+                self.__reused += 1
+
+        self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Caches a value which was received as part of a larger reply, such as a frame
+        bundle or controller snapshot.
+
+        Args:
+            key: The request header and arguments which identify the value.
+            value: The value to cache until the end of the current frame.
+        """
+        self.__values[key] = value
+        self.__last_values[key] = value
+
+    def contains(self, key: Hashable) -> bool:
+        """
+        Returns whether a value is cached, without counting it as an access.
+        """
+        return key in self.__values
+
+    def clear(self) -> None:
+        """
+        Discards all cached values, which is done at the end of each frame.  The most
+        recent value of each key is still kept in case a later request for it is lost.
+        """
+        self.__values.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Returns the number of accesses served from the cache (hits), the number which
+        required a request to RacecarSim (misses), the number of requests whose reply
+        was lost (lost), and the number of misses served with the value of an earlier
+        frame (reused) since the script started.
+        """
+        return {
+            "hits": self.__hits,
+            "misses": self.__misses,
+            "lost": self.__lost,
+            "reused": self.__reused,
+        }
@@ -0,0 +1,157 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Double-buffered blocks of sensor data exchanged with RacecarSim through shared memory.
+"""
+
+import struct
+from enum import IntEnum
+from typing import Dict, Optional
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Shared memory requires Python 3.8, otherwise all data is sent over UDP
+    shared_memory = None
+
+
+class SharedMemorySim:
+    """
+    A shared memory block divided into two slots for each stream of sensor data.
+
+    RacecarSim writes message number n of a stream into slot n % 2 and then sends n to
+    Python over UDP, so the slot which Python is reading is never the one being
+    written.  Each slot begins with the sequence number and size of its contents,
+    followed by the data itself.
+    """
+
+    class Stream(IntEnum):
+        """
+        The kinds of block messages which can be sent through shared memory.
+        """
+
+        color_image = 0
+        depth_image = 1
+        lidar = 2
+        frame_bundle = 3
+
+    # The bytes reserved for the contents of each slot of a stream, which must be large
+    # enough for the largest message RacecarSim sends on that stream
+    _CAPACITIES: Dict[Stream, int] = {
+        Stream.color_image: 640 * 480 * 4,
+        Stream.depth_image: 80 * 60 * 4,
+        Stream.lidar: 720 * 4,
+        Stream.frame_bundle: 1280 * 1024,
+    }
+
+    # The (sequence number, size) header at the start of each slot
+    __SLOT_HEADER = "II"
+
+    # Slots start on cache line boundaries
+    __ALIGNMENT = 64
+
+    @staticmethod
+    def is_available() -> bool:
+        """
+        Returns whether this Python installation supports shared memory.
+        """
+        return shared_memory is not None
+
+    def __init__(self, name: Optional[str] = None) -> None:
+        """
+        Creates a new shared memory block, or attaches to an existing one.
+
+        Args:
+            name: The name of an existing block to attach to, or None to create a new
+                block with a unique name.
+        """
+        self.__slot_offsets: Dict[SharedMemorySim.Stream, int] = {}
+        offset = 0
+        for stream in self.Stream:
+            self.__slot_offsets[stream] = offset
+            offset += 2 * self.__get_slot_size(stream)
+
+        self.__is_owner: bool = name is None
+        self.__memory = shared_memory.SharedMemory(
+            name=name, create=name is None, size=offset if name is None else 0
+        )
+
+    def get_name(self) -> str:
+        """
+        Returns the name which RacecarSim uses to attach to the block.
+        """
+        return self.__memory.name
+
+    def read(self, stream: Stream, sequence: int) -> memoryview:
+        """
+        Returns a zero-copy view of the contents of a message written by RacecarSim.
+
+        Args:
+            stream: The stream on which the message was sent.
+            sequence: The sequence number of the message, as received over UDP.
+
+        Note:
+            The view remains valid until RacecarSim writes the message after next on
+            the same stream.  A ConnectionError is raised if the message has already
+            been overwritten.
+        """
+        offset = self.__get_slot_offset(stream, sequence)
+        [slot_sequence, size] = struct.unpack_from(
+            self.__SLOT_HEADER, self.__memory.buf, offset
+        )
+        if slot_sequence != sequence:
+            # A late reply from an earlier exchange may name a message which has since
+            # been overwritten
+            raise ConnectionError(
+                f"Shared memory slot holds message [{slot_sequence}] instead of "
+                f"[{sequence}]."
+            )
+
+        offset += struct.calcsize(self.__SLOT_HEADER)
+        return self.__memory.buf[offset : offset + size]
+
+    def write(self, stream: Stream, sequence: int, data: bytes) -> None:
+        """
+        Writes the contents of a message into the slot for its sequence number.
+
+        Args:
+            stream: The stream on which the message is sent.
+            sequence: The sequence number of the message.
+            data: The contents of the message.
+        """
+        assert (
+            len(data) <= self._CAPACITIES[stream]
+        ), f"[{len(data)}] bytes do not fit in a [{stream.name}] slot."
+
+        offset = self.__get_slot_offset(stream, sequence)
+        data_offset = offset + struct.calcsize(self.__SLOT_HEADER)
+        self.__memory.buf[data_offset : data_offset + len(data)] = data
+
+        # Write the header last so that the slot never claims a partial message
+        struct.pack_into(
+            self.__SLOT_HEADER, self.__memory.buf, offset, sequence, len(data)
+        )
+
+    def close(self) -> None:
+        """
+        Detaches from the block, and frees it if it was created by this object.
+        """
+        try:
+            self.__memory.close()
+        except BufferError:
+            # Arrays returned by read still refer to the block, which is then unmapped
+            # when the process exits
+            pass
+        if self.__is_owner:
+            self.__memory.unlink()
+
+    def __get_slot_size(self, stream: Stream) -> int:
+        size = struct.calcsize(self.__SLOT_HEADER) + self._CAPACITIES[stream]
+        return -(-size // self.__ALIGNMENT) * self.__ALIGNMENT
+
+    def __get_slot_offset(self, stream: Stream, sequence: int) -> int:
+        return self.__slot_offsets[stream] + (sequence % 2) * self.__get_slot_size(
+            stream
+        )